@@ -13,20 +13,6 @@ class Coord:
         return Coord(self.i + other.i, self.j + other.j)
 
 
-class Segment(Enum):
-    INSIDE = auto()
-    OUTSIDE = auto()
-    LOOP = auto()
-
-    UNDETERMINED = auto()
-
-    @classmethod
-    def crossings_to_segment(cls, crossings: int) -> 'Segment':
-        if crossings % 2 == 0:
-            return cls.OUTSIDE
-        return cls.INSIDE
-
-
 class Move(Enum):
     NORTH = auto()
     EAST = auto()
@@ -49,6 +35,20 @@ class Move(Enum):
             case _:
                 return Coord(0, 0)
 
+    @classmethod
+    def reverse(cls, move: 'Move') -> 'Move':
+        match move:
+            case cls.NORTH:
+                return cls.SOUTH
+            case cls.EAST:
+                return cls.WEST
+            case cls.SOUTH:
+                return cls.NORTH
+            case cls.WEST:
+                return cls.EAST
+            case _:
+                return cls.INVALID
+
 
 class TileType(Enum):
     VERTICAL = auto()
@@ -82,183 +82,131 @@ class TileType(Enum):
             case _:
                 raise RuntimeError(f"Tile type {s} is not recognised.")
 
+    @classmethod
+    def connections(cls, tile_type: 'TileType') -> tuple[Move, ...]:
+        match tile_type:
+            case cls.VERTICAL:
+                return Move.NORTH, Move.SOUTH
+            case cls.HORIZONTAL:
+                return Move.EAST, Move.WEST
+            case cls.BENDNE:
+                return Move.NORTH, Move.EAST
+            case cls.BENDNW:
+                return Move.NORTH, Move.WEST
+            case cls.BENDSW:
+                return Move.SOUTH, Move.WEST
+            case cls.BENDSE:
+                return Move.SOUTH, Move.EAST
+            case _:
+                return ()
+
     @classmethod
     def tile_type_from_moves(cls, moves: list[Move]) -> 'TileType':
-        set_moves: set[Move] = set(moves)
-
-        if set_moves == set([Move.NORTH, Move.SOUTH]):
-            return cls.VERTICAL
-        if set_moves == set([Move.EAST, Move.WEST]):
-            return cls.HORIZONTAL
-        if set_moves == set([Move.NORTH, Move.EAST]):
-            return cls.BENDNE
-        if set_moves == set([Move.NORTH, Move.WEST]):
-            return cls.BENDNW
-        if set_moves == set([Move.SOUTH, Move.WEST]):
-            return cls.BENDSW
-        if set_moves == set([Move.SOUTH, Move.EAST]):
-            return cls.BENDSE
+        for tile_type in cls:
+            if set(cls.connections(tile_type)) == set(moves):
+                return tile_type
 
         raise RuntimeError(f"Can not handle moves={moves}")
 
 
-class Tile:
+TILE_CHARS = "|-LJ7F.S"
+TILE_CODES = bytes.maketrans(TILE_CHARS.encode(), bytes(TileType.from_str(c).value for c in TILE_CHARS))
+TILE_DECODES = bytes.maketrans(bytes(TileType.from_str(c).value for c in TILE_CHARS), TILE_CHARS.encode())
+MOVE_STRIDE = len(Move) + 1
 
-    def __init__(self, tile_char: str, segment: Segment = Segment.UNDETERMINED):
-        self.tile_type: TileType = TileType.from_str(tile_char)
-        self.tile_char: str = tile_char
-        self.segment: Segment = segment
 
-    def __repr__(self) -> str:
-        return self.tile_char
-
-    def move(self, move_in: Move) -> Move:
-        match self.tile_type:
-            case TileType.START:
-                return Move.INVALID
-            case TileType.VERTICAL:
-                match move_in:
-                    case Move.SOUTH:
-                        return Move.SOUTH
-                    case Move.NORTH:
-                        return Move.NORTH
-                    case _:
-                        return Move.INVALID
-            case TileType.HORIZONTAL:
-                match move_in:
-                    case Move.EAST:
-                        return Move.EAST
-                    case Move.WEST:
-                        return Move.WEST
-                    case _:
-                        return Move.INVALID
-            case TileType.BENDNE:
-                match move_in:
-                    case Move.SOUTH:
-                        return Move.EAST
-                    case Move.WEST:
-                        return Move.NORTH
-                    case _:
-                        return Move.INVALID
-            case TileType.BENDNW:
-                match move_in:
-                    case Move.SOUTH:
-                        return Move.WEST
-                    case Move.EAST:
-                        return Move.NORTH
-                    case _:
-                        return Move.INVALID
-            case TileType.BENDSW:
-                match move_in:
-                    case Move.NORTH:
-                        return Move.WEST
-                    case Move.EAST:
-                        return Move.SOUTH
-                    case _:
-                        return Move.INVALID
-            case TileType.BENDSE:
-                match move_in:
-                    case Move.NORTH:
-                        return Move.EAST
-                    case Move.WEST:
-                        return Move.SOUTH
-                    case _:
-                        return Move.INVALID
-            case TileType.GROUND:
-                raise RuntimeError(f"Tile type {move_in} should not be called with {self.__class__.__name__}.")
-            case _:
-                raise RuntimeError(f"Tile type {move_in} not recognised.")
+def compile_transitions() -> bytes:
+    '''
+    transitions[tile_type.value * MOVE_STRIDE + move_in.value] is the value of the move out of the tile, or Move.INVALID
+    '''
+    transitions = bytearray([Move.INVALID.value] * (len(TileType) + 1) * MOVE_STRIDE)
+    for tile_type in TileType:
+        for move_in in Move:
+            connections = TileType.connections(tile_type)
+            if Move.reverse(move_in) in connections:
+                move_out = connections[1] if connections[0] is Move.reverse(move_in) else connections[0]
+                transitions[tile_type.value * MOVE_STRIDE + move_in.value] = move_out.value
+    return bytes(transitions)
+
+
+TRANSITIONS = compile_transitions()
 
 
 class Maze:
 
     def __init__(self, tiles: list[str]):
-        self.tiles: list[list[Tile]] = []
-        self.start: Coord = Coord(0, 0)
-        for i in range(len(tiles)):
-            self.tiles.append([])
-            for j in range(len(tiles[0])):
-                self.tiles[i].append(Tile(tiles[i][j]))
-                if self.tiles[i][j].tile_type == TileType.START:
-                    self.start = Coord(i, j)
-
-    def __repr__(self, segment: Segment = Segment.LOOP) -> str:
-        s = ""
-        for row in self.tiles:
-            for elem in row:
-                if elem.segment is segment:
-                    s += '#'
-                else:
-                    s += str(elem)
-            s += "\n"
-        return s
-
-    def show_segment(self, segment: Segment = Segment.LOOP) -> str:
-        return self.__repr__(segment)
+        self.height: int = len(tiles)
+        self.width: int = len(tiles[0])
+        tile_bytes = "".join(tiles).encode()
+        if tile_bytes.translate(None, TILE_CHARS.encode()):
+            unrecognised = next(c for c in "".join(tiles) if c not in TILE_CHARS)
+            raise RuntimeError(f"Tile type {unrecognised} is not recognised.")
+        self.grid: bytearray = bytearray(tile_bytes.translate(TILE_CODES))
+        start = self.grid.index(TileType.START.value)
+        self.start: Coord = Coord(*divmod(start, self.width))
+        self.loop_length, self.loop_area = self.traverse_pipes()
 
-    def get_beginning_moves(self) -> list[Move]:
-        return list(move for move in Move if self.tiles[(self.start + Move.move_to_coord_offset(move)).i]
-                    [(self.start + Move.move_to_coord_offset(move)).j].move(move) != Move.INVALID)
+    def __repr__(self) -> str:
+        rows = self.grid.translate(TILE_DECODES).decode()
+        return "\n".join(rows[i:i + self.width] for i in range(0, len(rows), self.width)) + "\n"
+
+    def _valid_coord(self, coord: Coord) -> bool:
+        return 0 <= coord.i < self.height and 0 <= coord.j < self.width
 
-    def traverse_pipes(self) -> int:
+    def get_beginning_moves(self) -> list[Move]:
+        beginning_moves: list[Move] = []
+        for move in Move:
+            coord = self.start + Move.move_to_coord_offset(move)
+            if move is Move.INVALID or not self._valid_coord(coord):
+                continue
+            if TRANSITIONS[self.grid[coord.i * self.width + coord.j] * MOVE_STRIDE + move.value] != Move.INVALID.value:
+                beginning_moves.append(move)
+        return beginning_moves
+
+    def traverse_pipes(self) -> tuple[int, int]:
+        '''
+        Returns the loop length and twice the area enclosed by the loop, accumulated with the shoelace formula as the loop is traced
+        '''
         beginning_moves: list[Move] = self.get_beginning_moves()
-        start_tile_type: TileType = TileType.tile_type_from_moves(beginning_moves)
-        self.tiles[self.start.i][self.start.j].tile_type = start_tile_type
-        self.tiles[self.start.i][self.start.j].segment = Segment.LOOP
-        move = beginning_moves[0]  # pick random valid direction
-        move_count = 1
-        coord = self.start + Move.move_to_coord_offset(move)
-
-        while coord != self.start:
-            move = self.tiles[coord.i][coord.j].move(move)
-            coord += Move.move_to_coord_offset(move)
+        self.grid[self.start.i * self.width + self.start.j] = TileType.tile_type_from_moves(beginning_moves).value
+
+        di = [0] * MOVE_STRIDE
+        dj = [0] * MOVE_STRIDE
+        for move in Move:
+            di[move.value], dj[move.value] = Move.move_to_coord_offset(move).i, Move.move_to_coord_offset(move).j
+        grid, width, invalid = self.grid, self.width, Move.INVALID.value
+
+        move = beginning_moves[0].value  # pick random valid direction
+        i, j = self.start.i, self.start.j
+        move_count = 0
+        area = 0
+        while True:
+            area += i * dj[move] - di[move] * j
+            i += di[move]
+            j += dj[move]
             move_count += 1
-
-            self.tiles[coord.i][coord.j].segment = Segment.LOOP
-        return move_count
+            if i == self.start.i and j == self.start.j:
+                break
+            move = TRANSITIONS[grid[i * width + j] * MOVE_STRIDE + move]
+            if move == invalid:
+                raise RuntimeError(f"Pipe loop is broken at {Coord(i, j)}.")
+        return move_count, abs(area)
 
     def furthest_point(self) -> int:
-        move_count = self.traverse_pipes()
-        return move_count // 2 + 1 if move_count % 2 else move_count // 2
-
-    def partition(self) -> None:
-        height: int = len(self.tiles)
-        width: int = len(self.tiles[0])
-
-        for i in range(height):
-            inside: bool = False
-            prev_bend: TileType = TileType.GROUND
-            for j in range(width):
-                coord = Coord(i, j)
-                tile = self.tiles[coord.i][coord.j]
-
-                if tile.segment is Segment.LOOP:
-                    if tile.tile_type is TileType.VERTICAL:
-                        inside = not inside
-                    elif tile.tile_type is TileType.HORIZONTAL:
-                        pass
-                    elif tile.tile_type in (TileType.BENDNE, TileType.BENDSE):
-                        prev_bend = tile.tile_type
-                    elif tile.tile_type is TileType.BENDNW:
-                        if prev_bend is TileType.BENDSE:
-                            inside = not inside
-                    elif tile.tile_type is TileType.BENDSW:
-                        if prev_bend is TileType.BENDNE:
-                            inside = not inside
-                    else:
-                        raise RuntimeError(f"Tile type of previous bend '{prev_bend}' is not recognised.")
-
-                if tile.segment is not Segment.LOOP:
-                    tile.segment = Segment.INSIDE if inside else Segment.OUTSIDE
-
-    def count_segments(self, segment: Segment) -> int:
-        return sum(tile.segment is segment for row in self.tiles for tile in row)
+        return self.loop_length // 2 + 1 if self.loop_length % 2 else self.loop_length // 2
+
+    def enclosed_tiles(self) -> int:
+        '''
+        Pick's theorem for the interior tile count, using the loop as the boundary
+        '''
+        return self.loop_area // 2 - self.loop_length // 2 + 1
 
 
 class Day10:
 
     def __init__(self, filepath: Path):
         self.filepath = filepath
+        self.maze: Maze = Maze(self.parse())
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
@@ -268,16 +216,10 @@ class Day10:
         return self.parse_file()
 
     def part_1(self) -> int:
-        maze = Maze(self.parse_file())
-        return maze.furthest_point()
+        return self.maze.furthest_point()
 
     def part_2(self) -> int:
-        maze = Maze(self.parse_file())
-        maze.traverse_pipes()
-        maze.partition()
-        counts = maze.count_segments(Segment.INSIDE)
-
-        return counts
+        return self.maze.enclosed_tiles()
 
 
 if __name__ == "__main__":
@@ -288,5 +230,4 @@ if __name__ == "__main__":
 
     day10 = Day10(Path(args.input).absolute())
     print(day10.part_1())
-    # offset by one and I don't know why!
-    print(day10.part_2() - 1)
+    print(day10.part_2())
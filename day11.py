@@ -2,6 +2,7 @@ from pathlib import Path
 import argparse
 from enum import Enum, auto
 from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
 
 
 class Pixel(Enum):
@@ -28,47 +29,59 @@ class Coord:
 
 class Image:
 
-    def __init__(self, image_str: list[str]):
-        self.image: list[list[Pixel]] = Image.create_image(image_str)
-        self.galaxies: list[Coord] = Image.extract_galaxies(self.image)
-        empty_columns, empty_rows = self.find_expanded_columns_and_rows(self.image)
-        self.empty_columns: set[int] = empty_columns
-        self.empty_rows: set[int] = empty_rows
-
-    @staticmethod
-    def create_image(image_str: list[str]) -> list[list[Pixel]]:
-        image: list[list[Pixel]] = [[Pixel.INVALID] *
-                                    len(image_str) for _ in range(len(image_str[0]))]
+    def __init__(self, image_str: Iterable[str]):
+        self.galaxies: list[Coord] = []
+        self.occupied_rows: int = 0
+        self.occupied_columns: int = 0
+        self.height: int = 0
+        self.width: int = 0
         for i, row in enumerate(image_str):
-            for j, elem in enumerate(row):
-                image[i][j] = Pixel.from_str(elem)
-        return image
+            if row.count('#') + row.count('.') != len(row):
+                unrecognised = next(c for c in row if c not in '#.')
+                raise RuntimeError(f"Pixel {unrecognised} is not recognised.")
+            j = row.find('#')
+            while j != -1:
+                self.galaxies.append(Coord(i, j))
+                self.occupied_rows |= 1 << i
+                self.occupied_columns |= 1 << j
+                j = row.find('#', j + 1)
+            self.height = i + 1
+            self.width = max(self.width, len(row))
+
+    @property
+    def empty_rows(self) -> set[int]:
+        return {i for i in range(self.height) if not self.occupied_rows >> i & 1}
+
+    @property
+    def empty_columns(self) -> set[int]:
+        return {j for j in range(self.width) if not self.occupied_columns >> j & 1}
 
     @staticmethod
-    def extract_galaxies(image: list[list[Pixel]]) -> list[Coord]:
-        return list(Coord(i, j) for (i, row) in enumerate(image) for (j, pixel) in enumerate(row) if pixel is Pixel.GALAXY)
+    def _empty_before(occupied: int, coord: int) -> int:
+        return coord - (occupied & ((1 << coord) - 1)).bit_count()
 
     @staticmethod
-    def find_expanded_columns_and_rows(image: list[list[Pixel]]) -> tuple[set[int], set[int]]:
-        empty_columns = set()
-        empty_rows = set()
-        for i in range(len(image)):
-            if all(x is Pixel.SPACE for x in image[i]):
-                empty_rows.add(i)
-        for j in range(len(image[0])):
-            if all(row[j] is Pixel.SPACE for row in image):
-                empty_columns.add(j)
-        return empty_columns, empty_rows
-
-    def find_distances(self, expansion_coefficient: int = 2) -> int:
-        moves = 0
-        for i, gal1 in enumerate(self.galaxies):
-            for gal2 in self.galaxies[:i]:
-                for r in range(min(gal1.i, gal2.i), max(gal1.i, gal2.i)):
-                    moves += expansion_coefficient if r in self.empty_rows else 1
-                for c in range(min(gal1.j, gal2.j), max(gal1.j, gal2.j)):
-                    moves += expansion_coefficient if c in self.empty_columns else 1
-        return moves
+    def _pairwise_distance_sum(coords: list[int]) -> int:
+        '''
+        Sum of |a - b| over all pairs, from the prefix sums of the sorted coordinates
+        '''
+        total = 0
+        prefix_sum = 0
+        for k, coord in enumerate(sorted(coords)):
+            total += k * coord - prefix_sum
+            prefix_sum += coord
+        return total
+
+    def find_distances(self, expansion_coefficients: Sequence[int] = (2,)) -> list[int]:
+        '''
+        Every galaxy coordinate expands to coord + (expansion_coefficient - 1) * empty_before(coord). Both terms are
+        ordered the same way across galaxies, so each pairwise distance splits into an unexpanded and an empty line part.
+        '''
+        distance = (Image._pairwise_distance_sum([galaxy.i for galaxy in self.galaxies]) +
+                    Image._pairwise_distance_sum([galaxy.j for galaxy in self.galaxies]))
+        empty_lines_crossed = (Image._pairwise_distance_sum([Image._empty_before(self.occupied_rows, galaxy.i) for galaxy in self.galaxies]) +
+                               Image._pairwise_distance_sum([Image._empty_before(self.occupied_columns, galaxy.j) for galaxy in self.galaxies]))
+        return [distance + (expansion_coefficient - 1) * empty_lines_crossed for expansion_coefficient in expansion_coefficients]
 
 
 class Day11:
@@ -76,19 +89,18 @@ class Day11:
     def __init__(self, filepath: Path):
         self.filepath = filepath
         self.image = Image(self.parse())
+        self.distances: list[int] = self.image.find_distances((2, 1000000))
 
-    def parse_file(self) -> list[str]:
+    def parse(self) -> Iterator[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
-            return f.read().splitlines()
-
-    def parse(self) -> list[str]:
-        return self.parse_file()
+            for line in f:
+                yield line.rstrip('\n')
 
     def part_1(self) -> int:
-        return self.image.find_distances()
+        return self.distances[0]
 
     def part_2(self) -> int:
-        return self.image.find_distances(expansion_coefficient=1000000)
+        return self.distances[1]
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 from pathlib import Path
 import argparse
 from enum import Enum, auto
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
 
 
 class SpringType(Enum):
@@ -50,40 +52,44 @@ class Row:
         springs = self.springs.copy()
         for _ in range(folding_factor - 1):
             springs.extend([SpringType.UNKNOWN] + self.springs)
-        return self._combinations(tuple(springs), tuple(self.configuration * folding_factor))
+        return self._combinations(springs, self.configuration * folding_factor)
 
     @staticmethod
-    @lru_cache
-    def _combinations(springs: tuple[SpringType, ...], configuration: tuple[int, ...]) -> int:
-
-        # Base cases
-        if not springs:
-            # can only be valid if we are not expecting any more operational springs
-            return 1 if not configuration else 0
-        if not configuration:
-            # if we are not expecting more springs but there are still
-            return 1 if SpringType.DAMAGED not in springs else 0
-            # damaged springs this must not be valid
-
-        result = 0
-
-        # Decisions
-        if springs[0] in (SpringType.OPERATIONAL, SpringType.UNKNOWN):
-            # treat unknown spring as an operational spring
-            result += Row._combinations(springs[1:], configuration)
-
-        if springs[0] in (SpringType.DAMAGED, SpringType.UNKNOWN):
-            # treat unknown as a damaged spring
-            # this is the start of a block of damaged springs, but we need to determine: valid or invalid?
-            if (configuration[0] <= len(springs) and  # number of possible springs we are considering must be less than number of springs left
-               # block of damaged springs can't contain operational spring
-                SpringType.OPERATIONAL not in springs[:configuration[0]] and
-                (configuration[0] == len(springs) or  # not springs left, so number of springs left equals the configuration
-                    springs[configuration[0]] != SpringType.DAMAGED)):  # OR if there are springs afterwards the next spring must not be damaged!
-                result += Row._combinations(springs[configuration[0] + 1:],  # index springs by configuration[0] + 1 as we are looking for new damaged blocks
-                                            configuration[1:])                # and we know springs[configuration[0] + 1] is unknown or operational!
-                # We also found a damaged block, so remove the first config and recurse.
-        return result
+    def _combinations(springs: list[SpringType], configuration: list[int]) -> int:
+        '''
+        Iterative DP where ways[i] counts the arrangements of springs[i:] using configuration[group:].
+        Only the columns for the current and next group are kept, so memory is O(len(springs)) for this row alone.
+        '''
+        n = len(springs)
+
+        # next_operational[i] is the index of the first operational spring at or after i
+        next_operational: list[int] = [n] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            next_operational[i] = i if springs[i] is SpringType.OPERATIONAL else next_operational[i + 1]
+
+        # Base case: no groups left, so valid only if no damaged springs remain
+        # (ways[n + 1] stands in for "past the end" after a block that finishes on the last spring)
+        ways: list[int] = [0] * (n + 2)
+        ways[n] = ways[n + 1] = 1
+        for i in range(n - 1, -1, -1):
+            ways[i] = ways[i + 1] if springs[i] is not SpringType.DAMAGED else 0
+
+        for group in reversed(configuration):
+            next_ways = ways
+            ways = [0] * (n + 2)
+            for i in range(n - 1, -1, -1):
+                result = 0
+                if springs[i] is not SpringType.DAMAGED:
+                    # treat unknown spring as an operational spring
+                    result += ways[i + 1]
+                if springs[i] is not SpringType.OPERATIONAL:
+                    # start a block of damaged springs: it must fit, contain no operational spring,
+                    # and must not be followed directly by another damaged spring
+                    end = i + group
+                    if end <= n and next_operational[i] >= end and (end == n or springs[end] is not SpringType.DAMAGED):
+                        result += next_ways[end + 1]
+                ways[i] = result
+        return ways[0]
 
 
 class Field:
@@ -100,6 +106,34 @@ class Field:
                        int(spring_length) for spring_length in spring_lengths.split(',')]))
         return res
 
+    @staticmethod
+    def _batch_combinations(rows: list[Row], folding_factor: int) -> int:
+        return sum(row.combinations(folding_factor) for row in rows)
+
+    def batches(self, folding_factor: int = 1, batches_per_process: int = 4, processes: int | None = None) -> list[list[Row]]:
+        '''
+        Groups consecutive rows into batches of roughly equal DP cost, len(springs) * len(configuration) after folding
+        '''
+        costs = [len(row.springs) * len(row.configuration) * folding_factor ** 2 for row in self.rows]
+        target_cost = sum(costs) / ((processes or os.cpu_count() or 1) * batches_per_process)
+
+        batches: list[list[Row]] = [[]]
+        batch_cost = 0
+        for row, cost in zip(self.rows, costs):
+            if batches[-1] and batch_cost + cost > target_cost:
+                batches.append([])
+                batch_cost = 0
+            batches[-1].append(row)
+            batch_cost += cost
+        return batches
+
+    def combinations(self, folding_factor: int = 1, processes: int | None = None) -> int:
+        batches = self.batches(folding_factor, processes=processes)
+        if processes == 1:
+            return sum(Field._batch_combinations(batch, folding_factor) for batch in batches)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return sum(executor.map(Field._batch_combinations, batches, repeat(folding_factor)))
+
 
 class Day12:
 
@@ -115,10 +149,10 @@ class Day12:
         pass
 
     def part_1(self) -> int:
-        return sum(row.combinations() for row in self.field.rows)
+        return self.field.combinations()
 
     def part_2(self) -> int:
-        return sum(row.combinations(folding_factor=5) for row in self.field.rows)
+        return self.field.combinations(folding_factor=5)
 
 
 if __name__ == "__main__":
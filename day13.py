@@ -1,7 +1,7 @@
 from pathlib import Path
 import argparse
 from enum import Enum, auto
-from typing import Callable
+from typing import Iterator
 
 
 class Covering(Enum):
@@ -34,77 +34,101 @@ class Covering(Enum):
 
 class Pattern:
 
+    ROCK_BITS = str.maketrans('.#', '01')
+
     def __init__(self, pattern_str: list[str]):
-        self.pattern: list[list[Covering]] = []
-        for line in pattern_str:
-            self.pattern.append([Covering.from_str(elem) for elem in line])
+        width = len(pattern_str[0]) if pattern_str else 0
+        self.rows: list[int] = []
+        # access pattern column-wise (transposed), built in the same pass
+        self.columns: list[int] = [0] * width
+        for i, line in enumerate(pattern_str):
+            if line.count('#') + line.count('.') != len(line):
+                unrecognised = next(c for c in line if c not in '#.')
+                raise RuntimeError(f"Covering {unrecognised} is not recognised.")
+            if len(line) != width:
+                raise RuntimeError(f"Pattern row {line} does not have width {width}.")
+            # bit j is column j, so the string is reversed before reading it as binary
+            self.rows.append(int(line.translate(Pattern.ROCK_BITS)[::-1], 2))
+            j = line.find('#')
+            while j != -1:
+                self.columns[j] |= 1 << i
+                j = line.find('#', j + 1)
 
     def find_reflection_indexes(self, smudge: bool = False) -> tuple[int, int]:
-        if not smudge:
-            return self._find_reflection_index(Pattern.submirror_equality, rowwise=True), self._find_reflection_index(Pattern.submirror_equality, rowwise=False)
-        else:
-            return self._find_reflection_index(Pattern.submirror_one_difference, rowwise=True), self._find_reflection_index(
-                Pattern.submirror_one_difference, rowwise=False)
-
-    def _find_reflection_index(self, predicate: Callable[[list[list[Covering]], list[list[Covering]]], bool], rowwise: bool = True) -> int:
-
-        if rowwise:
-            pattern = self.pattern
-        else:
-            # access pattern column-wise (transposed)
-            pattern = list(zip(*self.pattern))
-
-        for index in range(1, len(pattern)):
-            above_partition = pattern[:index][::-1]
-            below_partition = pattern[index:]
-
-            above_partition = above_partition[:len(below_partition)]
-            below_partition = below_partition[:len(above_partition)]
+        exact, smudged = self.find_all_reflection_indexes()
+        return smudged if smudge else exact
 
-            if predicate(above_partition, below_partition):
-                return index
-        return 0
+    def find_all_reflection_indexes(self) -> tuple[tuple[int, int], tuple[int, int]]:
+        '''
+        Returns the exact and the smudged (one difference) reflection indexes, each as (row index, column index)
+        '''
+        exact_row, smudged_row = Pattern._find_reflection_index(self.rows)
+        exact_column, smudged_column = Pattern._find_reflection_index(self.columns)
+        return (exact_row, exact_column), (smudged_row, smudged_column)
 
     @staticmethod
-    def submirror_equality(pattern1: list[list[Covering]], pattern2: list[list[Covering]]) -> bool:
-        return pattern1 == pattern2
+    def _find_reflection_index(masks: list[int]) -> tuple[int, int]:
+        exact, smudged = 0, 0
+        for index in range(1, len(masks)):
+            differences = Pattern.submirror_differences(masks, index, 1)
+            if differences == 0 and not exact:
+                exact = index
+            elif differences == 1 and not smudged:
+                smudged = index
+            if exact and smudged:
+                break
+        return exact, smudged
 
     @staticmethod
-    def submirror_one_difference(pattern1: list[list[Covering]], pattern2: list[list[Covering]]) -> bool:
+    def submirror_differences(masks: list[int], index: int, max_differences: int) -> int:
+        '''
+        Number of mismatched cells when reflecting about index, stopping early once max_differences is exceeded
+        '''
         total_differences = 0
-        for row1, row2 in zip(pattern1, pattern2):
-            num_mismatches_in_row = sum(0 if elem1 == elem2 else 1 for elem1, elem2 in zip(row1, row2))
-            total_differences += num_mismatches_in_row
-        return total_differences == 1
+        for offset in range(min(index, len(masks) - index)):
+            total_differences += (masks[index - 1 - offset] ^ masks[index + offset]).bit_count()
+            if total_differences > max_differences:
+                break
+        return total_differences
 
 
 class Day13:
 
     def __init__(self, filepath: Path):
         self.filepath = filepath
-        self.patterns: list[Pattern] = [
-            Pattern(pattern_str) for pattern_str in self.parse()]
+        self.summaries: tuple[int, int] = self.summarize()
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
             return f.read().splitlines()
 
-    def parse(self) -> list[list[str]]:
-        pattern_strs: list[list[str]] = [[]]
-        for line in self.parse_file():
-            if not line:
-                pattern_strs.append([])
-            else:
-                pattern_strs[-1].append(line)
-        return pattern_strs
+    def parse(self) -> Iterator[list[str]]:
+        pattern_str: list[str] = []
+        with open(self.filepath, 'r', encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    pattern_str.append(line)
+                elif pattern_str:
+                    yield pattern_str
+                    pattern_str = []
+        if pattern_str:
+            yield pattern_str
+
+    def summarize(self) -> tuple[int, int]:
+        def summarize(x): return 100 * x[0] + x[1]
+        exact_summary, smudged_summary = 0, 0
+        for pattern_str in self.parse():
+            exact, smudged = Pattern(pattern_str).find_all_reflection_indexes()
+            exact_summary += summarize(exact)
+            smudged_summary += summarize(smudged)
+        return exact_summary, smudged_summary
 
     def part_1(self) -> int:
-        def summarize(x): return 100 * x[0] + x[1]
-        return sum(summarize(pattern.find_reflection_indexes()) for pattern in self.patterns)
+        return self.summaries[0]
 
     def part_2(self) -> int:
-        def summarize(x): return 100 * x[0] + x[1]
-        return sum(summarize(pattern.find_reflection_indexes(smudge=True)) for pattern in self.patterns)
+        return self.summaries[1]
 
 
 if __name__ == "__main__":
@@ -1,6 +1,9 @@
 from pathlib import Path
 import argparse
 from enum import Enum, auto
+from collections import OrderedDict
+from typing import Sequence
+import hashlib
 
 
 class PlatformObject(Enum):
@@ -32,19 +35,6 @@ class PlatformObject(Enum):
             case _:
                 raise RuntimeError(f"PlatformObject {s} is not recognised.")
 
-    def can_move(self, other_platform_object: 'PlatformObject') -> bool:
-        if self is self.ROUND_ROCK:
-            match other_platform_object:
-                case self.ROUND_ROCK:
-                    return False
-                case self.CUBE_ROCK:
-                    return False
-                case self.EMPTY_SPACE:
-                    return True
-                case _:
-                    raise RuntimeError(f"Platform object {other_platform_object} is not recognised.")
-        return False
-
     @property
     def contributes_to_load(self) -> bool:
         return self.moveable
@@ -61,124 +51,155 @@ class Direction(Enum):
     EAST = auto()
 
 
+class StateCache:
+    '''
+    LRU map from 128-bit platform state fingerprints to the iteration they were first seen, holding at most max_states entries
+    '''
+
+    def __init__(self, max_states: int = 1 << 16):
+        self.max_states: int = max_states
+        self.states: OrderedDict[bytes, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @staticmethod
+    def fingerprint(lines: Sequence[int], width: int) -> bytes:
+        line_bytes = (width + 7) // 8
+        return hashlib.blake2b(b"".join(line.to_bytes(line_bytes, 'little') for line in lines), digest_size=16).digest()
+
+    def get(self, fingerprint: bytes) -> int | None:
+        if fingerprint not in self.states:
+            return None
+        self.states.move_to_end(fingerprint)
+        return self.states[fingerprint]
+
+    def put(self, fingerprint: bytes, iteration: int) -> None:
+        self.states[fingerprint] = iteration
+        self.states.move_to_end(fingerprint)
+        if len(self.states) > self.max_states:
+            self.states.popitem(last=False)
+
+
 class ControlPlatform:
+    '''
+    Bitboard platform: round and cube rocks are stored as one int mask per row, bit j set for column j.
+    '''
 
     def __init__(self, control_platform: tuple[tuple[PlatformObject, ...], ...]):
-        self.control_platform: tuple[tuple[PlatformObject, ...], ...] = control_platform
-        self.cache: dict[tuple[tuple[PlatformObject, ...], ...],
-                         tuple[tuple[PlatformObject, ...], ...]] = {}
+        self.height: int = len(control_platform)
+        self.width: int = len(control_platform[0])
+        self.round_rows: list[int] = [ControlPlatform._encode(row, PlatformObject.ROUND_ROCK) for row in control_platform]
+        cube_rows: list[int] = [ControlPlatform._encode(row, PlatformObject.CUBE_ROCK) for row in control_platform]
+        self.row_segments: list[list[tuple[int, int, int]]] = [ControlPlatform._segments(cubes, self.width) for cubes in cube_rows]
+        self.column_segments: list[list[tuple[int, int, int]]] = [ControlPlatform._segments(cubes, self.height)
+                                                                  for cubes in ControlPlatform._transpose(cube_rows, self.width)]
+        self.cube_rows: tuple[int, ...] = tuple(cube_rows)
 
     def __str__(self) -> str:
         return self.__repr__()
 
     def __repr__(self) -> str:
-        return "\n".join("".join([PlatformObject.from_platform_object(element) for element in row])
-                         for row in self.control_platform) + "\n" + '&' * len(self.control_platform[0])
+        def element(i: int, j: int) -> PlatformObject:
+            if self.round_rows[i] >> j & 1:
+                return PlatformObject.ROUND_ROCK
+            if self.cube_rows[i] >> j & 1:
+                return PlatformObject.CUBE_ROCK
+            return PlatformObject.EMPTY_SPACE
+        return "\n".join("".join(PlatformObject.from_platform_object(element(i, j)) for j in range(self.width))
+                         for i in range(self.height)) + "\n" + '&' * self.width
 
     @staticmethod
     def create_control_platform(control_platform: list[list[PlatformObject]]) -> 'ControlPlatform':
         return ControlPlatform(tuple(tuple(row) for row in control_platform))
 
+    @staticmethod
+    def _encode(row: tuple[PlatformObject, ...], platform_object: PlatformObject) -> int:
+        mask = 0
+        for j, element in enumerate(row):
+            if element is platform_object:
+                mask |= 1 << j
+        return mask
+
+    @staticmethod
+    def _segments(cubes: int, length: int) -> list[tuple[int, int, int]]:
+        '''
+        (start, mask, length) of each run of cells between cube rocks
+        '''
+        segments: list[tuple[int, int, int]] = []
+        start = 0
+        for k in range(length + 1):
+            if k == length or cubes >> k & 1:
+                if k > start:
+                    segments.append((start, ((1 << (k - start)) - 1) << start, k - start))
+                start = k + 1
+        return segments
+
+    @staticmethod
+    def _transpose(lines: list[int], size: int) -> list[int]:
+        transposed = [0] * size
+        for i, line in enumerate(lines):
+            while line:
+                lowest_bit = line & -line
+                transposed[lowest_bit.bit_length() - 1] |= 1 << i
+                line ^= lowest_bit
+        return transposed
+
+    @staticmethod
+    def _pack(lines: list[int], segments: list[list[tuple[int, int, int]]], towards_low: bool) -> list[int]:
+        packed_lines: list[int] = []
+        for line, line_segments in zip(lines, segments):
+            packed = 0
+            for start, mask, length in line_segments:
+                rocks = (line & mask).bit_count()
+                if rocks:
+                    packed |= ((1 << rocks) - 1) << (start if towards_low else start + length - rocks)
+            packed_lines.append(packed)
+        return packed_lines
+
     @property
     def score(self) -> int:
-        score = 0
-        for i, row in enumerate(self.control_platform):
-            for element in row:
-                if element.contributes_to_load:
-                    score += len(self.control_platform) - i
-        return score
+        return sum(row.bit_count() * (self.height - i) for i, row in enumerate(self.round_rows))
+
+    @property
+    def state(self) -> bytes:
+        return StateCache.fingerprint(self.round_rows, self.width)
 
     def tilt(self, direction: Direction = Direction.NORTH) -> None:
 
         match direction:
-            case Direction.NORTH:
-                self._tilt_north()
-            case Direction.SOUTH:
-                self._tilt_south()
-            case Direction.EAST:
-                self._tilt_east()
-            case Direction.WEST:
-                self._tilt_west()
-
-    def _tilt_north(self) -> None:
-        control_platform = list(list(control_platform)
-                                for control_platform in self.control_platform)
-        for i, row in enumerate(control_platform):
-            for j, element in enumerate(row):
-                new_i = i - 1
-                if element.moveable:
-                    while new_i >= 0 and element.can_move(control_platform[new_i][j]):
-                        new_i -= 1
-                new_i = new_i + 1
-                if element.can_move(control_platform[new_i][j]):
-                    control_platform[new_i][j] = control_platform[i][j]
-                    control_platform[i][j] = PlatformObject.EMPTY_SPACE
-        self.control_platform = tuple(tuple(row) for row in control_platform)
-
-    def _tilt_south(self) -> None:
-        control_platform = list(list(control_platform)
-                                for control_platform in self.control_platform)
-        for i, row in enumerate(control_platform[::-1]):
-            i = len(control_platform) - 1 - i
-            for j, element in enumerate(row):
-                new_i = i + 1
-                if element.moveable:
-                    while new_i < len(control_platform) and element.can_move(control_platform[new_i][j]):
-                        new_i += 1
-                new_i = new_i - 1
-                if element.can_move(control_platform[new_i][j]):
-                    control_platform[new_i][j] = control_platform[i][j]
-                    control_platform[i][j] = PlatformObject.EMPTY_SPACE
-        self.control_platform = tuple(tuple(row) for row in control_platform)
-
-    def _tilt_west(self) -> None:
-        control_platform = list(list(control_platform)
-                                for control_platform in self.control_platform)
-        for i, row in enumerate(control_platform):
-            for j, element in enumerate(row):
-                new_j = j - 1
-                if element.moveable:
-                    while new_j >= 0 and element.can_move(control_platform[i][new_j]):
-                        new_j -= 1
-                new_j = new_j + 1
-                if element.can_move(control_platform[i][new_j]):
-                    control_platform[i][new_j] = control_platform[i][j]
-                    control_platform[i][j] = PlatformObject.EMPTY_SPACE
-        self.control_platform = tuple(tuple(row) for row in control_platform)
-
-    def _tilt_east(self) -> None:
-        control_platform = list(list(control_platform)
-                                for control_platform in self.control_platform)
-        for i, row in enumerate(control_platform):
-            for j, element in enumerate(row[::-1]):
-                j = len(row) - 1 - j
-                new_j = j + 1
-                if element.moveable:
-                    while new_j < len(control_platform) and element.can_move(control_platform[i][new_j]):
-                        new_j += 1
-                new_j = new_j - 1
-                if element.can_move(control_platform[i][new_j]):
-                    control_platform[i][new_j] = control_platform[i][j]
-                    control_platform[i][j] = PlatformObject.EMPTY_SPACE
-        self.control_platform = tuple(tuple(row) for row in control_platform)
-
-    def cycle(self, cycles: int = 1000000000) -> int:
-        score = self.score
-        for _ in range(cycles):
-            cache_index = self.control_platform
-            if cache_index in self.cache:
-                self.control_platform = self.cache[cache_index]
-            else:
-                self.tilt(Direction.NORTH)
-                self.tilt(Direction.WEST)
-                self.tilt(Direction.SOUTH)
-                self.tilt(Direction.EAST)
-                self.cache[cache_index] = self.control_platform
-
-            if score == self.score:
-                return score
-            score = self.score
-        return score
+            case Direction.NORTH | Direction.SOUTH:
+                columns = ControlPlatform._transpose(self.round_rows, self.width)
+                columns = ControlPlatform._pack(columns, self.column_segments, towards_low=direction is Direction.NORTH)
+                self.round_rows = ControlPlatform._transpose(columns, self.height)
+            case Direction.WEST | Direction.EAST:
+                self.round_rows = ControlPlatform._pack(self.round_rows, self.row_segments, towards_low=direction is Direction.WEST)
+
+    def spin(self) -> None:
+        self.tilt(Direction.NORTH)
+        self.tilt(Direction.WEST)
+        self.tilt(Direction.SOUTH)
+        self.tilt(Direction.EAST)
+
+    def cycle(self, cycles: int = 1000000000, max_cached_states: int = 1 << 16) -> int:
+        '''
+        Spins until a state repeats, then skips whole periods and only simulates the remainder.
+        A period longer than max_cached_states is not detected and is simulated in full.
+        '''
+        cache = StateCache(max_cached_states)
+        iteration = 0
+        while iteration < cycles:
+            state = self.state
+            seen_iteration = cache.get(state)
+            if seen_iteration is not None:
+                period = iteration - seen_iteration
+                for _ in range((cycles - iteration) % period):
+                    self.spin()
+                return self.score
+            cache.put(state, iteration)
+            self.spin()
+            iteration += 1
+        return self.score
 
 
 class Day14:
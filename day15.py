@@ -1,8 +1,21 @@
 from pathlib import Path
 import argparse
 from overrides import override
+from typing import BinaryIO, Iterable, Iterator
 import abc
 
+import numpy as np
+
+
+def compile_hash_table() -> bytes:
+    '''
+    hash_table[state << 8 | byte] is the HASH state after consuming byte from state
+    '''
+    return bytes((state + byte) * 17 % 256 for state in range(256) for byte in range(256))
+
+
+HASH_TABLE = compile_hash_table()
+
 
 class Hasher:
 
@@ -14,29 +27,64 @@ class Hasher:
         Set the current focal_length to itself multiplied by 17.
         Set the current focal_length to the remainder of dividing itself by 256.
         '''
+        return Hasher.hash_bytes(s.encode())
+
+    @staticmethod
+    def hash_bytes(b: bytes) -> int:
         current_value = 0
-        for c in s:
-            ascii_value = ord(c)
-            current_value += ascii_value
-            current_value *= 17
-            current_value %= 256
+        for byte in b:
+            current_value = HASH_TABLE[current_value << 8 | byte]
         return current_value
 
+    @staticmethod
+    def hash_step(step: bytes) -> tuple[int, int]:
+        '''
+        Returns the HASH of the whole step and of its label, computed in the same pass
+        '''
+        current_value = 0
+        label_value = -1
+        for byte in step:
+            if label_value < 0 and byte in b'=-':
+                label_value = current_value
+            current_value = HASH_TABLE[current_value << 8 | byte]
+        return current_value, label_value
+
+    @staticmethod
+    def hash_steps(buffer: bytes, labels_only: bool = False) -> np.ndarray:
+        '''
+        HASH of every comma separated step in buffer (or of just each step's label), advancing all steps one byte at a time
+        '''
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        commas = np.flatnonzero(data == ord(','))
+        starts = np.concatenate(([0], commas + 1))
+        ends = np.concatenate((commas, [len(data)]))
+        if labels_only:
+            operations = np.flatnonzero((data == ord('=')) | (data == ord('-')))
+            ends = operations[np.searchsorted(operations, starts)]
+        lengths = ends - starts
+
+        hash_table = np.frombuffer(HASH_TABLE, dtype=np.uint8).reshape(256, 256)
+        hash_values = np.zeros(len(starts), dtype=np.uint8)
+        for offset in range(int(lengths.max(initial=0))):
+            active = np.flatnonzero(lengths > offset)
+            hash_values[active] = hash_table[hash_values[active], data[starts[active] + offset]]
+        return hash_values
+
 
 class InitSequenceElementBase(abc.ABC):
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, hash_value: int | None = None):
         self.name: str = name
-        self.hash_value: int = Hasher.hash_value(name)
+        self.hash_value: int = Hasher.hash_value(name) if hash_value is None else hash_value
 
     @classmethod
-    def create_init_sequence_element(cls, s: str) -> 'InitSequenceElementBase':
+    def create_init_sequence_element(cls, s: str, hash_value: int | None = None) -> 'InitSequenceElementBase':
         if '=' in s:
             name, val = s.split('=')
-            return EqualInitSequenceElement(name, int(val))
+            return EqualInitSequenceElement(name, int(val), hash_value)
         elif '-' in s:
             name = s[:-1]
-            return MinusInitSequenceElement(name)
+            return MinusInitSequenceElement(name, hash_value)
         raise RuntimeError(f"SequenceElement {s} is invalid.")
 
     @abc.abstractmethod
@@ -46,8 +94,8 @@ class InitSequenceElementBase(abc.ABC):
 
 class EqualInitSequenceElement(InitSequenceElementBase):
 
-    def __init__(self, name: str, value: int):
-        super().__init__(name)
+    def __init__(self, name: str, value: int, hash_value: int | None = None):
+        super().__init__(name, hash_value)
         self.value: int = value
 
     @override
@@ -62,32 +110,131 @@ class MinusInitSequenceElement(InitSequenceElementBase):
         boxes.remove(self.name, self.hash_value)
 
 
+class FenwickTree:
+    '''
+    Prefix sums over slots that are appended at the end and updated in place, both in O(log n)
+    '''
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.tree: list[int] = [0]
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def prefix_sum(self, count: int) -> int:
+        total = 0
+        while count:
+            total += self.tree[count]
+            count &= count - 1
+        return total
+
+    def append(self, value: int) -> None:
+        index = len(self.tree)
+        self.tree.append(value + self.prefix_sum(index - 1) - self.prefix_sum(index - (index & -index)))
+
+    def add(self, slot: int, delta: int) -> None:
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+
+class LensBox:
+    '''
+    Lenses keep the slot they were first inserted into. Fenwick trees over the slots count the live lenses and sum their
+    focal lengths, so a lens's position is a prefix count and the box's power changes in O(log n) per operation.
+    '''
+
+    def __init__(self):
+        self.slots: dict[str, int] = {}
+        self.focal_lengths: list[int] = []
+        self.live_lenses: FenwickTree = FenwickTree()
+        self.live_focal_lengths: FenwickTree = FenwickTree()
+        # sum of lens position * focal length, without the box number
+        self.power: int = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def add(self, name: str, value: int) -> None:
+        slot = self.slots.get(name)
+        if slot is None:
+            self.slots[name] = len(self.focal_lengths)
+            self.focal_lengths.append(value)
+            self.live_lenses.append(1)
+            self.live_focal_lengths.append(value)
+            self.power += len(self.slots) * value
+        else:
+            delta = value - self.focal_lengths[slot]
+            self.focal_lengths[slot] = value
+            self.live_focal_lengths.add(slot, delta)
+            self.power += self.live_lenses.prefix_sum(slot + 1) * delta
+
+    def remove(self, name: str) -> None:
+        slot = self.slots.pop(name, None)
+        if slot is None:
+            return
+        focal_length = self.focal_lengths[slot]
+        # the removed lens's own term goes, and every later lens moves one position forwards
+        later_focal_lengths = self.live_focal_lengths.prefix_sum(len(self.live_focal_lengths)) - self.live_focal_lengths.prefix_sum(slot + 1)
+        self.power -= self.live_lenses.prefix_sum(slot + 1) * focal_length + later_focal_lengths
+        self.focal_lengths[slot] = 0
+        self.live_lenses.add(slot, -1)
+        self.live_focal_lengths.add(slot, -focal_length)
+        if len(self.focal_lengths) > 2 * len(self.slots) + 16:
+            self._compact()
+
+    def _compact(self) -> None:
+        '''
+        Drops the slots of removed lenses once they outnumber the live ones, keeping the trees proportional to the box
+        '''
+        names = sorted(self.slots, key=self.slots.__getitem__)
+        self.focal_lengths = [self.focal_lengths[self.slots[name]] for name in names]
+        self.slots = {name: slot for slot, name in enumerate(names)}
+        self.live_lenses = FenwickTree([1] * len(names))
+        self.live_focal_lengths = FenwickTree(self.focal_lengths)
+
+
 class Boxes:
 
     def __init__(self):
-        self.boxes: list[list[str]] = [[] for _ in range(256)]
-        self.focal_length_map: dict[str, int] = {}
+        self.boxes: list[LensBox] = [LensBox() for _ in range(256)]
+        self.total_focusing_power: int = 0
 
-    def process_sequence(self, sequence: list[InitSequenceElementBase]) -> None:
+    def process_sequence(self, sequence: Iterable[InitSequenceElementBase]) -> None:
         for element in sequence:
             element.operate_on_boxes(self)
 
     def remove(self, name: str, hash_value: int) -> None:
-        if name in self.boxes[hash_value]:
-            self.boxes[hash_value].remove(name)
+        box = self.boxes[hash_value]
+        power = box.power
+        box.remove(name)
+        self.total_focusing_power += (hash_value + 1) * (box.power - power)
 
     def add(self, name: str, hash_value: int, value: int) -> None:
-        if name not in self.boxes[hash_value]:
-            self.boxes[hash_value].append(name)
-        self.focal_length_map[name] = value
+        box = self.boxes[hash_value]
+        power = box.power
+        box.add(name, value)
+        self.total_focusing_power += (hash_value + 1) * (box.power - power)
 
     @property
     def focusing_power(self) -> int:
-        focusing_power = 0
-        for box_index, box in enumerate(self.boxes):
-            for lens_index, name in enumerate(box):
-                focusing_power += (box_index + 1) * (lens_index + 1) * self.focal_length_map[name]
-        return focusing_power
+        return self.total_focusing_power
+
+
+def tokenise_steps(reader: BinaryIO, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    '''
+    Yields comma separated steps from a binary reader (a buffered file or an mmap), one chunk at a time
+    '''
+    partial = b''
+    while chunk := reader.read(chunk_size):
+        steps = (partial + chunk.replace(b'\n', b'').replace(b'\r', b'')).split(b',')
+        partial = steps.pop()
+        yield from steps
+    if partial:
+        yield partial
 
 
 class Day15:
@@ -102,22 +249,46 @@ class Day15:
     def parse(self) -> list[str]:
         return self.parse_file()[0].split(',')
 
+    def parse_bytes(self) -> bytes:
+        with open(self.filepath, 'rb') as f:
+            return f.read().splitlines()[0]
+
     def part_1(self) -> int:
-        return sum(map(Hasher.hash_value, self.parse()))
+        return int(Hasher.hash_steps(self.parse_bytes()).sum(dtype=np.int64))
 
     def part_2(self) -> int:
-        sequence_elements: list[InitSequenceElementBase] = [InitSequenceElementBase.create_init_sequence_element(s) for s in self.parse()]
+        buffer = self.parse_bytes()
+        label_hash_values = Hasher.hash_steps(buffer, labels_only=True)
+        sequence_elements: list[InitSequenceElementBase] = [InitSequenceElementBase.create_init_sequence_element(s.decode(), int(hash_value))
+                                                            for s, hash_value in zip(buffer.split(b','), label_hash_values)]
         boxes = Boxes()
         boxes.process_sequence(sequence_elements)
         return boxes.focusing_power
 
+    def stream(self) -> tuple[int, int]:
+        '''
+        Hashes and applies each step to the boxes as it is read, returning the HASH sum and the focusing power
+        '''
+        hash_sum = 0
+        boxes = Boxes()
+        with open(self.filepath, 'rb') as f:
+            for step in tokenise_steps(f):
+                step_hash_value, label_hash_value = Hasher.hash_step(step)
+                hash_sum += step_hash_value
+                InitSequenceElementBase.create_init_sequence_element(step.decode(), label_hash_value).operate_on_boxes(boxes)
+        return hash_sum, boxes.focusing_power
+
 
 if __name__ == "__main__":
     INPUT_FILEPATH = Path(__file__).parent / "data" / f"{Path(__file__).stem}.txt"
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input', nargs='?', default=INPUT_FILEPATH, help=f"Path to data for {Path(__file__).stem}")
+    parser.add_argument('-s', '--stream', action='store_true', help="Process the initialisation sequence step by step as it is read")
     args = parser.parse_args()
 
     day15 = Day15(Path(args.input).absolute())
-    print(day15.part_1())
-    print(day15.part_2())
+    if args.stream:
+        print(*day15.stream(), sep="\n")
+    else:
+        print(day15.part_1())
+        print(day15.part_2())
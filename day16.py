@@ -2,6 +2,10 @@ from pathlib import Path
 import argparse
 from enum import Enum, auto
 from dataclasses import dataclass
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 
 
 @dataclass(frozen=True)
@@ -148,29 +152,183 @@ class MirrorTyle(Enum):
         return directions
 
 
-class Mirror:
-
-    def __init__(self, mirror: list[list[str]], lasers: list[Laser] = [Laser(Coord(0, 0), Direction.EAST)]):
-        self.mirror: list[list[MirrorTyle]] = list(list(MirrorTyle.from_str(tyle) for tyle in row) for row in mirror)
-        self.lasers: list[Laser] = lasers
-
-    def _valid_coord(self, coord: Coord) -> bool:
-        return 0 <= coord.i < len(self.mirror) and 0 <= coord.j < len(self.mirror[0])
+DIRECTIONS: list[Direction] = list(Direction)
+OUTGOING: dict[MirrorTyle, list[tuple[int, ...]]] = {
+    mirror_tyle: [tuple(DIRECTIONS.index(d) for d in MirrorTyle.query(mirror_tyle, direction)) for direction in DIRECTIONS]
+    for mirror_tyle in MirrorTyle}
 
-    def shoot_laser(self) -> int:
-        laser_states: set[Laser] = set()
 
-        while self.lasers:
-            laser = self.lasers.pop()
-            if laser not in laser_states:
-                laser_states.add(laser)
-                directions = MirrorTyle.query(self.mirror[laser.coord.i][laser.coord.j], laser.direction)
-                for direction in directions:
-                    new_laser = Laser(laser.coord + Direction.move(direction), direction)
-                    if self._valid_coord(new_laser.coord):
-                        self.lasers.append(new_laser)
+class Mirror:
 
-        return len(set(laser_state.coord for laser_state in laser_states))
+    def __init__(self, mirror: list[list[str]]):
+        self.height: int = len(mirror)
+        self.width: int = len(mirror[0])
+        self.mirror: tuple[MirrorTyle, ...] = tuple(MirrorTyle.from_str(tyle) for row in mirror for tyle in row)
+
+    def shoot_laser(self, laser: Laser = Laser(Coord(0, 0), Direction.EAST)) -> int:
+        '''
+        Beam state is a per-call bytearray with one bit per direction for every tile
+        '''
+        visited = bytearray(self.height * self.width)
+        offsets = [Direction.move(direction) for direction in DIRECTIONS]
+        lasers: list[tuple[int, int, int]] = [(laser.coord.i, laser.coord.j, DIRECTIONS.index(laser.direction))]
+
+        while lasers:
+            i, j, direction = lasers.pop()
+            cell = i * self.width + j
+            if visited[cell] >> direction & 1:
+                continue
+            visited[cell] |= 1 << direction
+            for next_direction in OUTGOING[self.mirror[cell]][direction]:
+                next_i, next_j = i + offsets[next_direction].i, j + offsets[next_direction].j
+                if 0 <= next_i < self.height and 0 <= next_j < self.width:
+                    lasers.append((next_i, next_j, next_direction))
+
+        return len(visited) - visited.count(0)
+
+    def max_energised(self, lasers: list[Laser], processes: int | None = None) -> int:
+        '''
+        Evaluates lasers on a process pool. Workers receive this immutable grid once through the pool initializer.
+        The fork start method is requested wherever it exists, so the grid is shared copy-on-write. Where it does not
+        (Windows), the default start method pickles the grid to each worker once instead.
+        '''
+        mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=processes, mp_context=mp_context, initializer=_init_worker, initargs=(self,)) as executor:
+            return max(executor.map(_shoot_laser, lasers, chunksize=max(1, len(lasers) // (4 * (processes or os.cpu_count() or 1)))))
+
+
+_worker_mirror: Mirror | None = None
+
+
+def _init_worker(mirror: Mirror) -> None:
+    global _worker_mirror
+    _worker_mirror = mirror
+
+
+def _shoot_laser(laser: Laser) -> int:
+    assert _worker_mirror is not None
+    return _worker_mirror.shoot_laser(laser)
+
+
+class BeamGraph:
+    '''
+    Straight beam segments are traced once each, between splitters that split the beam (the graph's nodes),
+    and the tiles energised from every node are memoised as bitsets over its condensed strongly connected component.
+    '''
+
+    def __init__(self, mirror: list[list[str]]):
+        self.height: int = len(mirror)
+        self.width: int = len(mirror[0])
+        self.tyles: list[MirrorTyle] = [MirrorTyle.from_str(tyle) for row in mirror for tyle in row]
+        self.directions: list[Direction] = DIRECTIONS
+        self.outgoing: dict[MirrorTyle, list[tuple[int, ...]]] = OUTGOING
+
+        self.nodes: dict[int, int] = {}
+        for cell, mirror_tyle in enumerate(self.tyles):
+            if mirror_tyle in (MirrorTyle.VERTICAL_SPLITTER, MirrorTyle.HORIZONTAL_SPLITTER):
+                self.nodes[cell] = len(self.nodes)
+
+        self.node_tiles: list[int] = [0] * len(self.nodes)
+        self.node_successors: list[set[int]] = [set() for _ in self.nodes]
+        for cell, node in self.nodes.items():
+            self.node_tiles[node] = 1 << cell
+            # a splitter emits the same pair of beams whichever side it is hit from
+            for direction in max(self.outgoing[self.tyles[cell]], key=len):
+                tiles, next_node = self._trace(cell, direction)
+                self.node_tiles[node] |= tiles
+                if next_node is not None:
+                    self.node_successors[node].add(next_node)
+
+        self.node_components, self.component_tiles = self._condense()
+
+    def _step(self, cell: int, direction: int) -> int | None:
+        i, j = divmod(cell, self.width)
+        offset = Direction.move(self.directions[direction])
+        i, j = i + offset.i, j + offset.j
+        if 0 <= i < self.height and 0 <= j < self.width:
+            return i * self.width + j
+        return None
+
+    def _trace(self, cell: int | None, direction: int, leaving: bool = True) -> tuple[int, int | None]:
+        '''
+        Follows one beam from cell in direction until it leaves the grid, is split or loops back onto itself
+        (possible through splitters it passes straight through), returning its tiles and the splitting node
+        '''
+        tiles = 0
+        seen: set[int] = set()
+        if leaving and cell is not None:
+            cell = self._step(cell, direction)
+        while cell is not None and cell << 2 | direction not in seen:
+            seen.add(cell << 2 | direction)
+            directions = self.outgoing[self.tyles[cell]][direction]
+            if len(directions) > 1:
+                return tiles, self.nodes[cell]
+            tiles |= 1 << cell
+            direction = directions[0]
+            cell = self._step(cell, direction)
+        return tiles, None
+
+    def _condense(self) -> tuple[list[int], list[int]]:
+        '''
+        Iterative Tarjan's algorithm. Components are found successors first, so each component's energised tiles
+        can be built from its members' own tiles and the already finished components it reaches.
+        '''
+        index_counter = 0
+        indexes: list[int] = [-1] * len(self.nodes)
+        lowlinks: list[int] = [0] * len(self.nodes)
+        on_stack: list[bool] = [False] * len(self.nodes)
+        stack: list[int] = []
+        node_components: list[int] = [-1] * len(self.nodes)
+        component_tiles: list[int] = []
+
+        for root in range(len(self.nodes)):
+            if indexes[root] != -1:
+                continue
+            work: list[tuple[int, Iterator[int]]] = [(root, iter(self.node_successors[root]))]
+            indexes[root] = lowlinks[root] = index_counter
+            index_counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if indexes[successor] == -1:
+                        indexes[successor] = lowlinks[successor] = index_counter
+                        index_counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = True
+                        work.append((successor, iter(self.node_successors[successor])))
+                        break
+                    if on_stack[successor]:
+                        lowlinks[node] = min(lowlinks[node], indexes[successor])
+                else:
+                    work.pop()
+                    if work:
+                        lowlinks[work[-1][0]] = min(lowlinks[work[-1][0]], lowlinks[node])
+                    if lowlinks[node] == indexes[node]:
+                        component = len(component_tiles)
+                        members: list[int] = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            node_components[member] = component
+                            members.append(member)
+                            if member == node:
+                                break
+                        tiles = 0
+                        for member in members:
+                            tiles |= self.node_tiles[member]
+                            for successor in self.node_successors[member]:
+                                if node_components[successor] != component:
+                                    tiles |= component_tiles[node_components[successor]]
+                        component_tiles.append(tiles)
+        return node_components, component_tiles
+
+    def energised(self, laser: Laser) -> int:
+        tiles, node = self._trace(laser.coord.i * self.width + laser.coord.j, self.directions.index(laser.direction), leaving=False)
+        if node is not None:
+            tiles |= self.component_tiles[self.node_components[node]]
+        return tiles.bit_count()
 
 
 class Day16:
@@ -182,11 +340,7 @@ class Day16:
         with open(self.filepath, 'r', encoding="utf-8") as f:
             return f.read().splitlines()
 
-    def part_1(self) -> int:
-        mirror = Mirror([[c for c in line] for line in self.parse_file()])
-        return mirror.shoot_laser()
-
-    def part_2(self) -> int:
+    def edge_lasers(self) -> list[Laser]:
         min_i, max_i = 0, len(self.parse_file()) - 1
         min_j, max_j = 0, len(self.parse_file()[0]) - 1
         lasers_going_north = [
@@ -197,19 +351,28 @@ class Day16:
             Laser(Coord(min_i, j), Direction.SOUTH) for j in range(max_j + 1)]
         lasers_going_west = [Laser(Coord(i, max_j), Direction.WEST)
                              for i in range(max_i + 1)]
-        return max(Mirror([[c for c in line] for line in self.parse_file()], [laser]).shoot_laser() for laser in lasers_going_north +
-                   lasers_going_east +
-                   lasers_going_south +
-                   lasers_going_west
-                   )
+        return lasers_going_north + lasers_going_east + lasers_going_south + lasers_going_west
+
+    def part_1(self) -> int:
+        mirror = Mirror([[c for c in line] for line in self.parse_file()])
+        return mirror.shoot_laser()
+
+    def part_2(self) -> int:
+        beam_graph = BeamGraph([[c for c in line] for line in self.parse_file()])
+        return max(beam_graph.energised(laser) for laser in self.edge_lasers())
+
+    def part_2_parallel(self, processes: int | None = None) -> int:
+        mirror = Mirror([[c for c in line] for line in self.parse_file()])
+        return mirror.max_energised(self.edge_lasers(), processes)
 
 
 if __name__ == "__main__":
     INPUT_FILEPATH = Path(__file__).parent / "data" / f"{Path(__file__).stem}.txt"
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input', nargs='?', default=INPUT_FILEPATH, help=f"Path to data for {Path(__file__).stem}")
+    parser.add_argument('-p', '--parallel', action='store_true', help="Evaluate every edge start on a process pool for part 2")
     args = parser.parse_args()
 
     day16 = Day16(Path(args.input).absolute())
     print(day16.part_1())
-    print(day16.part_2())
+    print(day16.part_2_parallel() if args.parallel else day16.part_2())
@@ -1,9 +1,7 @@
 from pathlib import Path
 import argparse
-from enum import StrEnum, auto
 from dataclasses import dataclass
 from heapq import heappush, heappop
-from typing import Callable
 
 
 @dataclass(frozen=True, order=True)
@@ -15,99 +13,115 @@ class Coord:
         return Coord(self.i + other.i, self.j + other.j)
 
 
-class Direction(StrEnum):
-    NORTH = auto()
-    WEST = auto()
-    SOUTH = auto()
-    EAST = auto()
-
-    @classmethod
-    def move(cls, direction: 'Direction') -> Coord:
-        match direction:
-            case cls.NORTH:
-                return Coord(-1, 0)
-            case cls.EAST:
-                return Coord(0, 1)
-            case cls.SOUTH:
-                return Coord(1, 0)
-            case cls.WEST:
-                return Coord(0, -1)
-            case _:
-                raise RuntimeError(f"Direction {direction} is not recognised.")
-
-    @classmethod
-    def reverse(cls, direction: 'Direction') -> 'Direction':
-        match direction:
-            case cls.NORTH:
-                return cls.SOUTH
-            case cls.EAST:
-                return cls.WEST
-            case cls.SOUTH:
-                return cls.NORTH
-            case cls.WEST:
-                return cls.EAST
-            case _:
-                raise RuntimeError(f"Direction {direction} is not recognised.")
-
-
-@dataclass(frozen=True, order=True)
-class CrucibleState:
-    coord: Coord
-    direction: Direction
-    steps_in_direction: int
+@dataclass(frozen=True)
+class Crucible:
+    min_run: int
+    max_run: int
 
 
 class City:
 
     def __init__(self, heat_losses: list[list[int]]):
         self.grid = heat_losses
-
-    def minimum_heat_loss(self, direction_predicate: Callable, start: Coord = Coord(0, 0), end: Coord | None = None) -> int:
-
+        self.height: int = len(heat_losses)
+        self.width: int = len(heat_losses[0])
+        self.heat_losses: list[int] = [heat_loss for row in heat_losses for heat_loss in row]
+        self.heuristics: dict[Coord, list[int]] = {}
+
+    def heuristic(self, end: Coord) -> list[int]:
+        '''
+        Lower bound on the heat loss from every cell to end, from a reverse Dijkstra that ignores run constraints.
+        It is consistent for every crucible, so it is computed once per end and shared between crucibles.
+        '''
+        if end not in self.heuristics:
+            height, width, heat_losses = self.height, self.width, self.heat_losses
+            end_cell = end.i * width + end.j
+            lower_bounds: list[int] = [sum(heat_losses) + 1] * (height * width)
+            lower_bounds[end_cell] = 0
+            priority_queue: list[tuple[int, int]] = [(0, end_cell)]
+            while priority_queue:
+                lower_bound, cell = heappop(priority_queue)
+                if lower_bound != lower_bounds[cell]:
+                    continue
+                i, j = divmod(cell, width)
+                # entering cell from a neighbour costs heat_losses[cell]
+                for previous_i, previous_j in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+                    if 0 <= previous_i < height and 0 <= previous_j < width:
+                        previous_cell = previous_i * width + previous_j
+                        if lower_bound + heat_losses[cell] < lower_bounds[previous_cell]:
+                            lower_bounds[previous_cell] = lower_bound + heat_losses[cell]
+                            heappush(priority_queue, (lower_bounds[previous_cell], previous_cell))
+            self.heuristics[end] = lower_bounds
+        return self.heuristics[end]
+
+    def minimum_heat_losses(self, crucibles: list[Crucible], start: Coord = Coord(0, 0), end: Coord | None = None) -> list[int]:
+        return [self.minimum_heat_loss(crucible, start, end) for crucible in crucibles]
+
+    def minimum_heat_loss(self, crucible: Crucible = Crucible(1, 3), start: Coord = Coord(0, 0), end: Coord | None = None) -> int:
+        '''
+        A* with a bucket queue (Dial's algorithm) keyed on heat loss plus heuristic, over packed states (cell << 1 | axis),
+        where axis is 0 if the crucible arrived moving vertically and 1 if it arrived horizontally. Every edge is a whole
+        straight run of min_run..max_run blocks followed by a turn, so the run length never needs to be part of the state.
+        '''
         if end is None:
-            end = Coord(len(self.grid) - 1, len(self.grid[0]) - 1)
-
-        initial_crucible_states: list[tuple[int, CrucibleState]] = [
-            (0, CrucibleState(start, direction, 0)) for direction in Direction]
-
-        priority_queue: list[tuple[int, CrucibleState]
-                             ] = initial_crucible_states
-        visited: set[CrucibleState] = set()
-
-        while priority_queue:
-            for _ in range(len(priority_queue)):
-
-                heat_loss_accum, crucible_state = heappop(priority_queue)
-
-                if crucible_state.coord == end:
-                    return heat_loss_accum
-
-                if crucible_state in visited:
+            end = Coord(self.height - 1, self.width - 1)
+
+        height, width, heat_losses = self.height, self.width, self.heat_losses
+        min_run, max_run = crucible.min_run, crucible.max_run
+        lower_bounds = self.heuristic(end)
+        end_cell = end.i * width + end.j
+        start_cell = start.i * width + start.j
+
+        infinity = sum(heat_losses) + 1
+        heat_loss_accums: list[int] = [infinity] * (2 * height * width)
+        visited = bytearray(2 * height * width)
+        # a run can raise heat loss plus heuristic by at most twice its own heat loss
+        num_buckets = 2 * max(heat_losses) * max_run + 1
+        buckets: list[list[int]] = [[] for _ in range(num_buckets)]
+
+        estimate = lower_bounds[start_cell]
+        for axis in (0, 1):
+            heat_loss_accums[start_cell << 1 | axis] = 0
+            buckets[estimate % num_buckets].append(start_cell << 1 | axis)
+        queued = 2
+
+        while queued:
+            bucket = buckets[estimate % num_buckets]
+            while bucket:
+                state = bucket.pop()
+                queued -= 1
+                cell, axis = state >> 1, state & 1
+                heat_loss_accum = heat_loss_accums[state]
+                if visited[state] or heat_loss_accum + lower_bounds[cell] != estimate:
                     continue
+                visited[state] = 1
 
-                visited.add(crucible_state)
-
-                directions = [direction for direction in Direction]
-                for next_direction in directions:
-
-                    next_coord = crucible_state.coord + Direction.move(next_direction)
-                    if not self._within_boundary(next_coord):
-                        continue
-
-                    if not direction_predicate(next_direction, crucible_state):
-                        continue
-
-                    next_steps_in_direction = crucible_state.steps_in_direction + 1 if next_direction is crucible_state.direction else 1
-                    next_heat_loss_accum = self.grid[next_coord.i][next_coord.j] + heat_loss_accum
-                    next_crucible_state = (next_heat_loss_accum, CrucibleState(next_coord, next_direction, next_steps_in_direction))
+                if cell == end_cell:
+                    return heat_loss_accum
 
-                    heappush(priority_queue, next_crucible_state)
+                i, j = divmod(cell, width)
+                # turn onto the other axis, in either direction
+                if axis == 0:
+                    run_stride, run_limits, next_axis = 1, (j, width - 1 - j), 1
+                else:
+                    run_stride, run_limits, next_axis = width, (i, height - 1 - i), 0
+                for sign, run_limit in zip((-1, 1), run_limits):
+                    stride = sign * run_stride
+                    next_cell = cell
+                    next_heat_loss_accum = heat_loss_accum
+                    for run in range(1, min(max_run, run_limit) + 1):
+                        next_cell += stride
+                        next_heat_loss_accum += heat_losses[next_cell]
+                        if run < min_run:
+                            continue
+                        next_state = next_cell << 1 | next_axis
+                        if next_heat_loss_accum < heat_loss_accums[next_state]:
+                            heat_loss_accums[next_state] = next_heat_loss_accum
+                            buckets[(next_heat_loss_accum + lower_bounds[next_cell]) % num_buckets].append(next_state)
+                            queued += 1
+            estimate += 1
         return -1
 
-    def _within_boundary(self, coord: Coord) -> bool:
-        return (0 <= coord.i < len(self.grid)
-                and 0 <= coord.j < len(self.grid[0]))
-
 
 class Day17:
 
@@ -123,28 +137,10 @@ class Day17:
         return [[int(heat_loss) for heat_loss in line] for line in self.parse_file()]
 
     def part_1(self) -> int:
-
-        def standard_crucible_direction_predicate(next_direction: Direction, crucible_state: CrucibleState) -> bool:
-            if next_direction is Direction.reverse(crucible_state.direction):
-                return False
-            if next_direction is crucible_state.direction and crucible_state.steps_in_direction >= 3:
-                return False
-            return True
-
-        return self.city.minimum_heat_loss(standard_crucible_direction_predicate)
+        return self.city.minimum_heat_loss(Crucible(min_run=1, max_run=3))
 
     def part_2(self) -> int:
-
-        def ultra_crucible_direction_predicate(next_direction: Direction, crucible_state: CrucibleState) -> bool:
-            if next_direction is Direction.reverse(crucible_state.direction):
-                return False
-            if next_direction is not crucible_state.direction and crucible_state.steps_in_direction < 4:
-                return False
-            if next_direction is crucible_state.direction and crucible_state.steps_in_direction >= 10:
-                return False
-            return True
-
-        return self.city.minimum_heat_loss(ultra_crucible_direction_predicate)
+        return self.city.minimum_heat_loss(Crucible(min_run=4, max_run=10))
 
 
 if __name__ == "__main__":
@@ -2,7 +2,9 @@ from pathlib import Path
 import argparse
 from enum import StrEnum, auto
 from dataclasses import dataclass
-from typing import Sequence
+from typing import Iterable, Sequence
+
+import numpy as np
 
 
 @dataclass(frozen=True)
@@ -66,8 +68,11 @@ class DigPlan(ColourMixin, Instruction):
 class ColourInstruction(ColourMixin, Instruction):
 
     def __post_init__(self):
-        self.steps = int(self.colour[:-1], base=16)
-        ending_colour = self.colour[-1]
+        self.direction, self.steps = ColourInstruction.decode(self.colour)
+
+    @classmethod
+    def decode(cls, colour: str) -> tuple[Direction, int]:
+        ending_colour = colour[-1]
         match ending_colour:
             case '0':
                 direction = Direction.R
@@ -78,47 +83,127 @@ class ColourInstruction(ColourMixin, Instruction):
             case '3':
                 direction = Direction.U
             case _:
-                raise RuntimeError(f"{self.__class__.__name__} ending digit {ending_colour} is not recognised.")
-        self.direction = direction
+                raise RuntimeError(f"{cls.__name__} ending digit {ending_colour} is not recognised.")
+        return direction, int(colour[:-1], base=16)
 
 
-class Digger:
+class PolygonAccumulator:
+    '''
+    Running shoelace sum and perimeter of the dig path, updated one instruction at a time
+    '''
 
-    def __init__(self, instructions: Sequence[Instruction]):
-        self.instructions = instructions
+    def __init__(self):
+        self.coord: Coord = Coord(0, 0)
+        self.shoelace: int = 0
+        self.perimeter: int = 0
 
-    def _create_vertex_coords(self) -> list[Coord]:
-        coord = Coord(0, 0)
-        vertex_coords: list[Coord] = [coord]
-        for instr in self.instructions:
-            coord += instr.steps * Direction.move(instr.direction)
-            vertex_coords.append(coord)
-        return vertex_coords
-
-    def _polygon_area(self) -> int:
-        vertex_coords = self._create_vertex_coords()
-        polygon_area = 0
-        for i, curr_vertex in enumerate(vertex_coords):
-            prev_vertex = vertex_coords[i - 1]
-            next_vertex = vertex_coords[(i + 1) % len(vertex_coords)]
-            polygon_area += curr_vertex.i * (prev_vertex.j - next_vertex.j)
-        return abs(polygon_area) // 2
+    def add(self, direction: Direction, steps: int) -> None:
+        next_coord = self.coord + steps * Direction.move(direction)
+        self.shoelace += self.coord.i * next_coord.j - next_coord.i * self.coord.j
+        self.perimeter += steps
+        self.coord = next_coord
 
     def dig(self) -> int:
         '''
         Using Pick's theorem to calculate area from vertex coordinates
         '''
-        polygon_area = self._polygon_area()
-        boundary_area = sum(instr.steps for instr in self.instructions)
+        polygon_area = abs(self.shoelace) // 2
+        boundary_area = self.perimeter
         interior_area = polygon_area - boundary_area // 2 + 1
         return interior_area + boundary_area
 
 
+class Digger:
+
+    def __init__(self, instructions: Iterable[Instruction]):
+        self.instructions = instructions
+
+    def dig(self) -> int:
+        polygon = PolygonAccumulator()
+        for instr in self.instructions:
+            polygon.add(instr.direction, instr.steps)
+        return polygon.dig()
+
+
+class BatchDigger:
+    '''
+    Vectorised lagoon areas for many dig plans at once. All instructions are concatenated into flat arrays,
+    vertices come from a cumulative sum per plan, and shoelace sums and perimeters are reduced per plan.
+    '''
+
+    DIRECTION_OFFSETS: dict[str, Coord] = {str(direction): Direction.move(direction) for direction in Direction}
+    COLOUR_DIRECTIONS: dict[int, Direction] = {digit: ColourInstruction.decode(f"{digit:06x}")[0] for digit in range(len(Direction))}
+
+    def __init__(self, plans: Sequence[Sequence[str]]):
+        if any(not plan for plan in plans):
+            raise RuntimeError(f"{self.__class__.__name__} can not dig an empty plan.")
+        self.num_plans: int = len(plans)
+        lines = [line.split() for plan in plans for line in plan]
+        self.plan_starts: np.ndarray = np.cumsum([0] + [len(plan) for plan in plans[:-1]])
+
+        directions = "".join(split_line[0] for split_line in lines).lower()
+        if unrecognised := set(directions) - set(self.DIRECTION_OFFSETS):
+            raise RuntimeError(f"{self.__class__.__name__} direction {unrecognised.pop()} is not recognised.")
+        self.directions: np.ndarray = np.frombuffer(directions.encode(), dtype=np.uint8)
+        self.steps: np.ndarray = np.array([int(split_line[1]) for split_line in lines], dtype=np.int64)
+
+        colour_fields = [split_line[-1][2:-1] for split_line in lines]
+        if (colour := next((colour for colour in colour_fields if len(colour) != 6), None)) is not None:
+            raise RuntimeError(f"{self.__class__.__name__} colour {colour} is not 6 hex digits.")
+        colours = np.frombuffer("".join(colour_fields).lower().encode(), dtype=np.uint8).reshape(-1, 6).astype(np.int64)
+        # hex digits '0'-'9' and 'a'-'f' to their values
+        self.colour_digits: np.ndarray = np.where(colours >= ord('a'), colours - ord('a') + 10, colours - ord('0'))
+        invalid_colours = np.flatnonzero(((self.colour_digits < 0) | (self.colour_digits > 15)).any(axis=1))
+        if len(invalid_colours):
+            raise RuntimeError(f"{self.__class__.__name__} colour {colour_fields[invalid_colours[0]]} is not 6 hex digits.")
+        invalid_endings = np.flatnonzero(self.colour_digits[:, 5] >= len(self.COLOUR_DIRECTIONS))
+        if len(invalid_endings):
+            raise RuntimeError(f"{self.__class__.__name__} ending digit {colour_fields[invalid_endings[0]][-1]} is not recognised.")
+
+    def _offsets(self, colour_decoded: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        di_lookup = np.zeros(256, dtype=np.int64)
+        dj_lookup = np.zeros(256, dtype=np.int64)
+        if colour_decoded:
+            for digit, direction in self.COLOUR_DIRECTIONS.items():
+                di_lookup[digit], dj_lookup[digit] = Direction.move(direction).i, Direction.move(direction).j
+            direction_codes = self.colour_digits[:, 5]
+            steps = self.colour_digits[:, :5] @ (16 ** np.arange(4, -1, -1, dtype=np.int64))
+        else:
+            for direction, offset in self.DIRECTION_OFFSETS.items():
+                di_lookup[ord(direction)], dj_lookup[ord(direction)] = offset.i, offset.j
+            direction_codes = self.directions
+            steps = self.steps
+        return di_lookup[direction_codes] * steps, dj_lookup[direction_codes] * steps, steps
+
+    def dig(self, colour_decoded: bool = False) -> np.ndarray:
+        '''
+        Lagoon area for every plan, using Pick's theorem. Falls back to exact Python integers if int64 could overflow.
+        '''
+        if not self.num_plans:
+            return np.zeros(0, dtype=np.int64)
+        di, dj, steps = self._offsets(colour_decoded)
+        perimeters = np.add.reduceat(steps, self.plan_starts)
+        plan_lengths = np.diff(np.append(self.plan_starts, len(steps)))
+        if 2 * int(perimeters.max()) ** 2 * int(plan_lengths.max()) >= np.iinfo(np.int64).max:
+            di, dj, perimeters = di.astype(object), dj.astype(object), perimeters.astype(object)
+
+        # cumulative coordinates, restarted at the origin for every plan
+        i, j = np.cumsum(di), np.cumsum(dj)
+        plan_ids = np.repeat(np.arange(len(self.plan_starts)), plan_lengths)
+        i = i - (i[self.plan_starts] - di[self.plan_starts])[plan_ids]
+        j = j - (j[self.plan_starts] - dj[self.plan_starts])[plan_ids]
+        previous_i, previous_j = i - di, j - dj
+
+        shoelaces = np.add.reduceat(previous_i * j - i * previous_j, self.plan_starts)
+        polygon_areas = np.abs(shoelaces) // 2
+        return polygon_areas + perimeters // 2 + 1
+
+
 class Day18:
 
     def __init__(self, filepath: Path):
         self.filepath = filepath
-        self.dig_plans: list[DigPlan] = self.parse()
+        self.lagoon_areas: tuple[int, int] = self.stream()
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
@@ -132,22 +217,41 @@ class Day18:
             dig_plans.append(dig_plan)
         return dig_plans
 
+    def stream(self) -> tuple[int, int]:
+        '''
+        Single pass over the dig plan, accumulating both the plain and the colour decoded polygons
+        '''
+        polygon = PolygonAccumulator()
+        colour_polygon = PolygonAccumulator()
+        with open(self.filepath, 'r', encoding="utf-8") as f:
+            for line in f:
+                split_line = line.split()
+                if not split_line:
+                    continue
+                polygon.add(Direction[split_line[0]], int(split_line[1]))
+                colour_polygon.add(*ColourInstruction.decode(split_line[-1][2:-1]))
+        return polygon.dig(), colour_polygon.dig()
+
     def part_1(self) -> int:
-        digger = Digger(self.dig_plans)
-        return digger.dig()
+        return self.lagoon_areas[0]
 
     def part_2(self) -> int:
-        instructions = [ColourInstruction(dig_plan.direction, dig_plan.steps, dig_plan.colour) for dig_plan in self.dig_plans]
-        digger = Digger(instructions)
-        return digger.dig()
+        return self.lagoon_areas[1]
 
 
 if __name__ == "__main__":
     INPUT_FILEPATH = Path(__file__).parent / "data" / f"{Path(__file__).stem}.txt"
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input', nargs='?', default=INPUT_FILEPATH, help=f"Path to data for {Path(__file__).stem}")
+    parser.add_argument('-b', '--batch', nargs='+', help="Paths to many dig plans, printing both lagoon areas for each")
     args = parser.parse_args()
 
-    day18 = Day18(Path(args.input).absolute())
-    print(day18.part_1())
-    print(day18.part_2())
+    if args.batch:
+        plans = [Path(path).read_text(encoding="utf-8").splitlines() for path in args.batch]
+        batch_digger = BatchDigger([[line for line in plan if line.strip()] for plan in plans])
+        for path, area, colour_area in zip(args.batch, batch_digger.dig(), batch_digger.dig(colour_decoded=True)):
+            print(path, area, colour_area)
+    else:
+        day18 = Day18(Path(args.input).absolute())
+        print(day18.part_1())
+        print(day18.part_2())
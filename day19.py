@@ -2,6 +2,8 @@ from pathlib import Path
 import argparse
 from enum import StrEnum, auto
 from dataclasses import dataclass
+from typing import Sequence
+import math
 
 
 class PartCategory(StrEnum):
@@ -39,73 +41,30 @@ class Operator(StrEnum):
             case _:
                 raise RuntimeError(f"Operator {comparison} is not recognised.")
 
-    @classmethod
-    def partition(cls, comparison: 'Operator', interval: Interval, partition_value: int) -> tuple[Interval, Interval]:
-        '''
-        Returns true_interval, false_interval as a tuple
-        '''
-        match comparison:
-            case cls.LESS_THAN:
-                return Interval(interval.lower, min(partition_value - 1, interval.upper)), Interval(max(partition_value, interval.lower), interval.upper)
-            case cls.GREATER_THAN:
-                return Interval(max(partition_value + 1, interval.lower), interval.upper), Interval(interval.lower, min(partition_value, interval.upper))
-            case _:
-                raise RuntimeError(f"Operator {comparison} is not recognised.")
-
 
 class Outcome(StrEnum):
-    A = auto()
-    R = auto()
-
-
-class PartInterval:
-
-    def __init__(self, interval_dict: dict[PartCategory, Interval]):
-        self.intervals = interval_dict
-
-    def get_interval(self, part_category: PartCategory) -> Interval:
-        return self.intervals[part_category]
-
-    def copy(self) -> 'PartInterval':
-        return PartInterval(self.intervals.copy())
-
-    @property
-    def valid(self) -> bool:
-        return all(interval.valid for interval in self.intervals.values())
-
-    @property
-    def rating(self) -> int:
-        return sum(interval.lower for interval in self.intervals.values())
-
-    @property
-    def length_products(self) -> int:
-        return (self.intervals[PartCategory.x].length *
-                self.intervals[PartCategory.m].length *
-                self.intervals[PartCategory.a].length *
-                self.intervals[PartCategory.s].length)
+    A = 'A'
+    R = 'R'
 
 
 class Rule:
 
     def __init__(self, rule_str: str):
         if ':' in rule_str:
-            part_category, operator, *value_and_outcome = rule_str
-            self.part_category: PartCategory = PartCategory(part_category)
-            self.operator: Operator = Operator(operator)
-            self.value: int = int("".join(value_and_outcome).split(':')[0])
-            self.outcome: str = "".join(value_and_outcome).split(':')[1]
+            condition, outcome = rule_str.split(':')
+            self.outcome: str = outcome
+            self.part_category: PartCategory | None = PartCategory(condition[0])
+            self.operator: Operator | None = Operator(condition[1])
+            self.value: int = int(condition[2:])
         else:
-            self.part_category: PartCategory = PartCategory.x  # arbitrary
-            self.operator: Operator = Operator.GREATER_THAN
-            self.value: int = -1
-            self.outcome: str = rule_str
+            self.part_category = None
+            self.operator = None
+            self.value = -1
+            self.outcome = rule_str
 
-    def partition(self, part_interval: PartInterval) -> tuple[PartInterval, PartInterval]:
-        true_interval, false_interval = Operator.partition(self.operator, part_interval.get_interval(self.part_category), self.value)
-        true_part_interval, false_part_interval = part_interval.copy(), part_interval.copy()
-        true_part_interval.intervals[self.part_category] = true_interval
-        false_part_interval.intervals[self.part_category] = false_interval
-        return true_part_interval, false_part_interval
+    @property
+    def conditional(self) -> bool:
+        return self.part_category is not None
 
 
 class Workflow:
@@ -115,45 +74,94 @@ class Workflow:
         self.name: str = name
         self.rules: list[Rule] = list(map(Rule, rules[:-1].split(',')))
 
-    def query_interval(self, part_interval: PartInterval) -> list[tuple[PartInterval, str]]:
-        further_processing: list[tuple[PartInterval, str]] = []
-        for rule in self.rules:
-            pass_part_interval, fail_part_interval = rule.partition(part_interval)
-            if pass_part_interval.valid:
-                further_processing.append((pass_part_interval, rule.outcome))
-            if fail_part_interval.valid:
-                part_interval = fail_part_interval
-            else:
-                break
 
-        return further_processing
+class DecisionTree:
+    '''
+    Workflows compiled into flat node arrays. Node k sends a part to true_branches[k] if
+    part[categories[k]] < thresholds[k], otherwise to false_branches[k]. Branches are node indexes,
+    or the negative leaves ACCEPT and REJECT. A '>' rule is stored as a '<' test with swapped branches.
+    '''
 
+    ACCEPT: int = -1
+    REJECT: int = -2
+    CATEGORY_INDEXES: dict[PartCategory, int] = {part_category: index for index, part_category in enumerate(PartCategory)}
 
-class Workflows:
+    def __init__(self, workflows: list[Workflow], root: str = "in"):
+        self.workflows: dict[str, Workflow] = {workflow.name: workflow for workflow in workflows}
+        self.categories: list[int] = []
+        self.thresholds: list[int] = []
+        self.true_branches: list[int] = []
+        self.false_branches: list[int] = []
+        self._nodes: dict[tuple[int, int, int, int], int] = {}
+        self._compiled: dict[str, int] = {Outcome.A: DecisionTree.ACCEPT, Outcome.R: DecisionTree.REJECT}
+        self.root: int = self._compile(root)
 
-    def __init__(self, workflows: list[Workflow]):
-        self.workflows: dict[str, Workflow] = {
-            workflow.name: workflow for workflow in workflows}
+    def __len__(self) -> int:
+        return len(self.categories)
 
-    def query_interval(self, part_interval: PartInterval, query_workflow: str = "in") -> list[PartInterval]:
+    def _node(self, category: int, threshold: int, true_branch: int, false_branch: int) -> int:
         '''
-        Recursive
+        Pass-through tests (both branches equal) fold away and identical subtrees are shared.
         '''
-
-        # Base cases
-        if query_workflow.lower() == str(Outcome.R):
-            return []
-        if query_workflow.lower() == str(Outcome.A):
-            return [part_interval]
-
-        total_part_intervals = []
-
-        further_processing = self.workflows[query_workflow].query_interval(part_interval)
-
-        for part_interval, target_workflow in further_processing:
-            total_part_intervals += self.query_interval(part_interval, target_workflow)
-
-        return total_part_intervals
+        if true_branch == false_branch:
+            return true_branch
+        key = (category, threshold, true_branch, false_branch)
+        if key not in self._nodes:
+            self._nodes[key] = len(self.categories)
+            self.categories.append(category)
+            self.thresholds.append(threshold)
+            self.true_branches.append(true_branch)
+            self.false_branches.append(false_branch)
+        return self._nodes[key]
+
+    def _compile(self, name: str) -> int:
+        if name in self._compiled:
+            return self._compiled[name]
+        if name not in self.workflows:
+            raise RuntimeError(f"Workflow {name} is not recognised.")
+
+        rules = self.workflows[name].rules
+        if rules[-1].conditional:
+            raise RuntimeError(f"Workflow {name} has no fallback rule.")
+        # build the chain from the fallback rule backwards, so each rule's false branch is already compiled
+        branch = self._compile(rules[-1].outcome)
+        for rule in reversed(rules[:-1]):
+            outcome = self._compile(rule.outcome)
+            category = DecisionTree.CATEGORY_INDEXES[rule.part_category]
+            if rule.operator is Operator.LESS_THAN:
+                branch = self._node(category, rule.value, outcome, branch)
+            else:
+                branch = self._node(category, rule.value + 1, branch, outcome)
+        self._compiled[name] = branch
+        return branch
+
+    def accepts(self, part: Sequence[int]) -> bool:
+        categories, thresholds, true_branches, false_branches = self.categories, self.thresholds, self.true_branches, self.false_branches
+        node = self.root
+        while node >= 0:
+            node = true_branches[node] if part[categories[node]] < thresholds[node] else false_branches[node]
+        return node == DecisionTree.ACCEPT
+
+    def count_accepted(self, interval: Interval = Interval(1, 4000)) -> int:
+        '''
+        Number of accepted parts with every category in interval, splitting hyper-rectangles at each test
+        '''
+        categories, thresholds, true_branches, false_branches = self.categories, self.thresholds, self.true_branches, self.false_branches
+        accepted = 0
+        stack: list[tuple[int, tuple[int, ...], tuple[int, ...]]] = [
+            (self.root, (interval.lower,) * len(PartCategory), (interval.upper,) * len(PartCategory))]
+        while stack:
+            node, lowers, uppers = stack.pop()
+            if node < 0:
+                if node == DecisionTree.ACCEPT:
+                    accepted += math.prod(upper - lower + 1 for lower, upper in zip(lowers, uppers))
+                continue
+            category, threshold = categories[node], thresholds[node]
+            if lowers[category] < threshold:
+                stack.append((true_branches[node], lowers, uppers[:category] + (min(uppers[category], threshold - 1),) + uppers[category + 1:]))
+            if uppers[category] >= threshold:
+                stack.append((false_branches[node], lowers[:category] + (max(lowers[category], threshold),) + lowers[category + 1:], uppers))
+        return accepted
 
 
 class Day19:
@@ -162,7 +170,7 @@ class Day19:
         self.filepath = filepath
         workflows, parts = self.parse()
         self.parts: list[dict[str, int]] = parts
-        self.workflows: Workflows = Workflows(workflows)
+        self.decision_tree: DecisionTree = DecisionTree(workflows)
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
@@ -170,11 +178,12 @@ class Day19:
 
     def parse(self) -> tuple[list[Workflow], list[dict[str, int]]]:
         i = 0
+        lines = self.parse_file()
         workflows: list[Workflow] = []
         parts: list[dict[str, int]] = []
 
-        while i < len(self.parse_file()):
-            line = self.parse_file()[i]
+        while i < len(lines):
+            line = lines[i]
             if not line:
                 break
             workflows.append(Workflow(line))
@@ -183,8 +192,8 @@ class Day19:
 
         i += 1
 
-        while i < len(self.parse_file()):
-            line = self.parse_file()[i]
+        while i < len(lines):
+            line = lines[i]
             if not line:
                 break
             cat_and_vals = line[1:-1].split(',')
@@ -195,12 +204,11 @@ class Day19:
         return workflows, parts
 
     def part_1(self) -> int:
-        part_intervals = list(PartInterval({PartCategory(k): Interval(v, v + 1) for k, v in part.items()}) for part in self.parts)
-        return sum(queried_part_interval.rating for part_interval in part_intervals for queried_part_interval in self.workflows.query_interval(part_interval))
+        parts = [tuple(part[part_category] for part_category in PartCategory) for part in self.parts]
+        return sum(sum(part) for part in parts if self.decision_tree.accepts(part))
 
     def part_2(self) -> int:
-        part_category_intervals = PartInterval({part_category: Interval(1, 4000) for part_category in PartCategory})
-        return sum(part_interval.length_products for part_interval in self.workflows.query_interval(part_category_intervals))
+        return self.decision_tree.count_accepted(Interval(1, 4000))
 
 
 if __name__ == "__main__":
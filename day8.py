@@ -2,8 +2,7 @@ from pathlib import Path
 import argparse
 
 from enum import StrEnum, auto
-from itertools import cycle
-from functools import reduce
+from dataclasses import dataclass
 import math
 
 
@@ -12,22 +11,43 @@ class MoveInstruction(StrEnum):
     R = auto()
 
 
-class Node:
+def combine_congruences(r1: int, m1: int, r2: int, m2: int) -> tuple[int, int] | None:
+    g = math.gcd(m1, m2)
+    if (r2 - r1) % g:
+        return None
+    lcm = m1 // g * m2
+    k = ((r2 - r1) // g * pow(m1 // g, -1, m2 // g)) % (m2 // g)
+    return (r1 + m1 * k) % lcm, lcm
 
-    def __init__(self, node_name: str):
-        self.node_name: str = node_name
-        self.left: Node
-        self.right: Node
-        self.starting_node: bool = False
-        self.ending_node: bool = False
 
-    def add_left(self, left: 'Node'):
-        self.left = left
+@dataclass(frozen=True)
+class GhostCycle:
+    prefix_hits: frozenset[int]
+    cycle_start: int
+    period: int
+    cycle_hits: frozenset[int]
 
-    def add_right(self, right: 'Node'):
-        self.right = right
+    def hits(self, step: int) -> bool:
+        if step < self.cycle_start:
+            return step in self.prefix_hits
+        return self.cycle_start + (step - self.cycle_start) % self.period in self.cycle_hits
 
-    def move_once(self, mi: MoveInstruction) -> 'Node':
+
+class CompiledNetwork:
+
+    def __init__(self, nodes: list[tuple[str, str, str]], move_instructions: list[MoveInstruction], levels: int = 64):
+        self.node_names: tuple[str, ...] = tuple(node[0] for node in nodes)
+        self.node_indexes: dict[str, int] = {node_name: i for i, node_name in enumerate(self.node_names)}
+        self.left: tuple[int, ...] = tuple(self.node_indexes[node[1]] for node in nodes)
+        self.right: tuple[int, ...] = tuple(self.node_indexes[node[2]] for node in nodes)
+        self.move_instructions: tuple[MoveInstruction, ...] = tuple(move_instructions)
+        self.move_tables: tuple[tuple[int, ...], ...] = tuple(self._move_table(mi) for mi in move_instructions)
+        self.cycle_jumps: tuple[tuple[int, ...], ...] = self._compile_cycle_jumps(max(levels, len(self).bit_length() + 2))
+
+    def __len__(self) -> int:
+        return len(self.node_names)
+
+    def _move_table(self, mi: MoveInstruction) -> tuple[int, ...]:
         match mi:
             case MoveInstruction.L:
                 return self.left
@@ -36,78 +56,162 @@ class Node:
             case _:
                 raise RuntimeError(f"{mi} is not a recognised move")
 
+    def _compile_cycle_jumps(self, levels: int) -> tuple[tuple[int, ...], ...]:
+        '''
+        cycle_jumps[level][node] is the node reached after 2^level passes of the move instructions.
+        '''
+        cycle_jump: list[int] = []
+        for node in range(len(self)):
+            for move_table in self.move_tables:
+                node = move_table[node]
+            cycle_jump.append(node)
+
+        cycle_jumps: list[tuple[int, ...]] = [tuple(cycle_jump)]
+        while len(cycle_jumps) < levels:
+            previous = cycle_jumps[-1]
+            cycle_jumps.append(tuple(previous[node] for node in previous))
+        return tuple(cycle_jumps)
+
+    def jump_cycles(self, node: int, cycles: int) -> int:
+        top_level = len(self.cycle_jumps) - 1
+        while cycles >> top_level:
+            node = self.cycle_jumps[top_level][node]
+            cycles -= 1 << top_level
+        level = 0
+        while cycles:
+            if cycles & 1:
+                node = self.cycle_jumps[level][node]
+            cycles >>= 1
+            level += 1
+        return node
+
+    def position(self, node: int, steps: int) -> int:
+        cycles, remainder = divmod(steps, len(self.move_tables))
+        node = self.jump_cycles(node, cycles)
+        for move_table in self.move_tables[:remainder]:
+            node = move_table[node]
+        return node
+
+    def first_hits(self, ending_nodes: set[int]) -> list[int]:
+        '''
+        Step (1..len(move_instructions)) at which each node first reaches an ending node during one pass, or 0 if it does not.
+        '''
+        first_hits: list[int] = []
+        for node in range(len(self)):
+            first_hit = 0
+            for step, move_table in enumerate(self.move_tables, start=1):
+                node = move_table[node]
+                if node in ending_nodes:
+                    first_hit = step
+                    break
+            first_hits.append(first_hit)
+        return first_hits
+
+    def pass_hits(self, ending_nodes: set[int]) -> list[tuple[int, ...]]:
+        pass_hits: list[tuple[int, ...]] = []
+        for node in range(len(self)):
+            hits: list[int] = []
+            for step, move_table in enumerate(self.move_tables, start=1):
+                node = move_table[node]
+                if node in ending_nodes:
+                    hits.append(step)
+            pass_hits.append(tuple(hits))
+        return pass_hits
+
+    def ghost_cycle(self, node: int, pass_hits: list[tuple[int, ...]]) -> GhostCycle:
+        '''
+        The (node, instruction index) state repeats with a period that is a whole number of passes,
+        so cycle detection only needs to follow the single pass jump table.
+        '''
+        passes: list[int] = []
+        first_seen: dict[int, int] = {}
+        while node not in first_seen:
+            first_seen[node] = len(passes)
+            passes.append(node)
+            node = self.cycle_jumps[0][node]
+
+        cycle_pass = first_seen[node]
+        hits = [k * len(self.move_tables) + step for k, pass_node in enumerate(passes) for step in pass_hits[pass_node]]
+        cycle_start = cycle_pass * len(self.move_tables) + 1
+        return GhostCycle(frozenset(hit for hit in hits if hit < cycle_start), cycle_start,
+                          (len(passes) - cycle_pass) * len(self.move_tables), frozenset(hit for hit in hits if hit >= cycle_start))
+
+    def steps_to_ending(self, starting_nodes: list[int], ending_nodes: set[int]) -> list[int]:
+        first_hits = self.first_hits(ending_nodes)
+
+        # hit_within[level][node] is True if an ending node is reached within 2^level passes from node
+        levels = len(self).bit_length() + 1
+        hit_within: list[list[bool]] = [[first_hit > 0 for first_hit in first_hits]]
+        for level in range(1, levels + 1):
+            previous, previous_jump = hit_within[-1], self.cycle_jumps[level - 1]
+            hit_within.append([previous[node] or previous[previous_jump[node]] for node in range(len(self))])
+
+        steps: list[int] = []
+        for node in starting_nodes:
+            if not hit_within[levels][node]:
+                raise RuntimeError(f"{self.node_names[node]} never reaches an ending node")
+            cycles = 0
+            for level in range(levels - 1, -1, -1):
+                if not hit_within[level][node]:
+                    node = self.cycle_jumps[level][node]
+                    cycles += 1 << level
+            steps.append(cycles * len(self.move_tables) + first_hits[node])
+        return steps
+
 
 class NodesBase:
 
-    def __init__(self, nodes: list[tuple[str, str, str]], move_instructions: list[MoveInstruction]):
-        self.node_instances: list[tuple[Node, str, str]] = [
-            (Node(node[0]), node[1], node[2]) for node in nodes]
-        node_dict: dict[str, Node] = {
-            node[0].node_name: node[0] for node in self.node_instances}
-        self.nodes: dict[str, Node] = self._add_nodes(node_dict)
-        self.move_instructions = move_instructions
-        self.cycle: cycle[MoveInstruction] = cycle(move_instructions)
+    def __init__(self, network: CompiledNetwork):
+        self.network: CompiledNetwork = network
 
-    def _add_nodes(self, node_dict: dict[str, Node]) -> dict[str, Node]:
-        nodes: dict[str, Node] = {}
-        for node_instance, left, right in self.node_instances:
-            node_instance.add_left(node_dict[left])
-            node_instance.add_right(node_dict[right])
-            nodes[node_instance.node_name] = node_instance
-        return nodes
+    def _node_indexes(self, node_names: list[str] | set[str]) -> list[int]:
+        return [self.network.node_indexes[node_name] for node_name in node_names]
 
 
 class Nodes(NodesBase):
 
-    def __init__(self, nodes: list[tuple[str, str, str]], move_instructions: list[MoveInstruction]):
-        super().__init__(nodes, move_instructions)
-
-    def move(self, starting_node: Node) -> int:
-        curr_node: Node = starting_node
-
-        moves = 0
-        while not curr_node.ending_node:
-            moves += 1
-            curr_node = curr_node.move_once(next(self.cycle))
-        return moves
+    def move(self, starting_node: str, ending_nodes: set[str]) -> int:
+        if starting_node in ending_nodes:
+            return 0
+        return self.network.steps_to_ending(self._node_indexes([starting_node]), set(self._node_indexes(ending_nodes)))[0]
 
 
 class SimultaneousNodes(NodesBase):
 
-    def __init__(self, nodes: list[tuple[str, str, str]], move_instructions: list[MoveInstruction]):
-        super().__init__(nodes, move_instructions)
-
-    def move(self, starting_nodes: list[Node]) -> int:
-        moves = 0
-        first_hit_per_node = [0] * len(starting_nodes)
+    MAX_RESIDUES: int = 1 << 12
 
-        while not all(first_hit_per_node):
-            moves += 1
-            next_move = next(self.cycle)
-            for i in range(len(starting_nodes)):
-                starting_nodes[i] = starting_nodes[i].move_once(next_move)
-            for i, starting_node in enumerate(starting_nodes):
-                if not first_hit_per_node[i] and starting_node.ending_node:
-                    first_hit_per_node[i] = moves
-
-        prime_factors = []
-        for num_of_moves in first_hit_per_node:
-            prime_factors += SimultaneousNodes._prime_factors(num_of_moves)
-        return reduce(lambda x, y: x * y, set(prime_factors))
+    def move(self, starting_nodes: list[str], ending_nodes: set[str]) -> int:
+        pass_hits = self.network.pass_hits(set(self._node_indexes(ending_nodes)))
+        ghosts = [self.network.ghost_cycle(node, pass_hits) for node in self._node_indexes(starting_nodes)]
+        return SimultaneousNodes._synchronise(ghosts)
 
     @staticmethod
-    def _prime_factors(n: int) -> list[int]:
-        factors: list[int] = []
-        while n % 2 == 0:
-            n = n // 2
-
-        for i in range(3, int(math.sqrt(n)) + 1, 2):
-            while n % i == 0:
-                factors.append(i)
-                n = n // i
-        if n > 2:
-            factors.append(n)
-        return factors
+    def _synchronise(ghosts: list[GhostCycle]) -> int:
+        # before every ghost is inside its cycle, only the latest ghost's prefix hits are candidates
+        latest_ghost = max(ghosts, key=lambda ghost: ghost.cycle_start)
+        for step in sorted(latest_ghost.prefix_hits):
+            if all(ghost.hits(step) for ghost in ghosts):
+                return step
+
+        # combine the sparsest ghosts into residues modulo the lcm of their periods while that stays small,
+        # then scan those residues in increasing step order, checking the denser ghosts directly
+        remaining = sorted(ghosts, key=lambda ghost: len(ghost.cycle_hits))
+        residues, modulus = {0}, 1
+        while remaining and len(residues) * len(remaining[0].cycle_hits) <= SimultaneousNodes.MAX_RESIDUES:
+            ghost = remaining.pop(0)
+            combined = {congruence for r in residues for hit in ghost.cycle_hits
+                        if (congruence := combine_congruences(r, modulus, hit % ghost.period, ghost.period)) is not None}
+            residues, modulus = {r for r, _ in combined}, math.lcm(modulus, ghost.period)
+            if not residues:
+                raise RuntimeError("Ghosts never reach ending nodes simultaneously")
+
+        offsets = sorted((r - latest_ghost.cycle_start) % modulus for r in residues)
+        period = math.lcm(*(ghost.period for ghost in ghosts))
+        for block_start in range(latest_ghost.cycle_start, latest_ghost.cycle_start + period, modulus):
+            for offset in offsets:
+                if all(ghost.hits(block_start + offset) for ghost in remaining):
+                    return block_start + offset
+        raise RuntimeError("Ghosts never reach ending nodes simultaneously")
 
 
 class Day8:
@@ -118,6 +222,7 @@ class Day8:
         self.instructions: list[MoveInstruction] = [
             MoveInstruction[i] for i in instructions]
         self.nodes: list[tuple[str, str, str]] = nodes
+        self.network: CompiledNetwork = CompiledNetwork(self.nodes, self.instructions)
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
@@ -133,27 +238,12 @@ class Day8:
         return instructions, nodes
 
     def part_1(self) -> int:
-        nodes = Nodes(self.nodes, self.instructions)
-        for node, _, _ in nodes.node_instances:
-            if node.node_name == "AAA":
-                node.starting_node = True
-                starting_node: Node = node
-            if node.node_name == "ZZZ":
-                node.ending_node = True
-        return nodes.move(starting_node)
+        return Nodes(self.network).move("AAA", {"ZZZ"})
 
     def part_2(self) -> int:
-        simultaneous_nodes = SimultaneousNodes(self.nodes, self.instructions)
-        starting_nodes = []
-        ending_nodes = []
-        for node, _, _ in simultaneous_nodes.node_instances:
-            if node.node_name.endswith("A"):
-                node.starting_node = True
-                starting_nodes.append(node)
-            if node.node_name.endswith("Z"):
-                node.ending_node = True
-                ending_nodes.append(node)
-        return simultaneous_nodes.move(starting_nodes)
+        starting_nodes = [node_name for node_name in self.network.node_names if node_name.endswith("A")]
+        ending_nodes = {node_name for node_name in self.network.node_names if node_name.endswith("Z")}
+        return SimultaneousNodes(self.network).move(starting_nodes, ending_nodes)
 
 
 if __name__ == "__main__":
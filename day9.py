@@ -1,17 +1,87 @@
 from pathlib import Path
 import argparse
+from functools import lru_cache
+from typing import Iterable, Iterator, Sequence
+import math
+import sys
 
+import numpy as np
 
-def extrapolate(subhistory: list[int], forwards: bool = True) -> int:
-    if all(val == 0 for val in subhistory):
-        return 0
 
-    deltas: list[int] = [y - x for x, y in zip(subhistory, subhistory[1:])]
-    diff: int = extrapolate(deltas, forwards)
+@lru_cache
+def lagrange_weights(length: int, steps: int = 1) -> tuple[int, ...]:
+    '''
+    Integer weights w such that sum(w[i] * history[i]) extrapolates a history of the given length
+    `steps` values forwards (steps > 0) or backwards (steps < 0).
+    '''
+    if steps == 0:
+        raise RuntimeError("Extrapolation must be at least one step forwards or backwards.")
+    position = length - 1 + steps if steps > 0 else steps
+    return tuple(math.prod(position - j for j in range(length) if j != i) // math.prod(i - j for j in range(length) if j != i)
+                 for i in range(length))
 
-    if not forwards:
-        return subhistory[0] - diff
-    return subhistory[-1] + diff
+
+def extrapolate(subhistory: list[int], forwards: bool = True, steps: int = 1) -> int:
+    weights = lagrange_weights(len(subhistory), steps if forwards else -steps)
+    return sum(weight * value for weight, value in zip(weights, subhistory))
+
+
+class HistoryMatrix:
+
+    def __init__(self, histories: list[list[int]]):
+        self.num_histories: int = len(histories)
+        indexes_by_length: dict[int, list[int]] = {}
+        for index, history in enumerate(histories):
+            indexes_by_length.setdefault(len(history), []).append(index)
+        self.indexes: dict[int, np.ndarray] = {length: np.array(indexes) for length, indexes in indexes_by_length.items()}
+        self.matrices: dict[int, np.ndarray] = {}
+        # largest sum(|value|) of any history in each matrix, in Python ints so the overflow checks can not overflow
+        self.abs_sums: dict[int, int] = {}
+        for length, indexes in indexes_by_length.items():
+            rows = [histories[index] for index in indexes]
+            fits = all(-np.iinfo(np.int64).max <= value <= np.iinfo(np.int64).max for row in rows for value in row)
+            self.matrices[length] = np.array(rows, dtype=np.int64 if fits else object)
+            self.abs_sums[length] = max((sum(abs(value) for value in row) for row in rows), default=0)
+
+    def extrapolate(self, steps: Sequence[int] = (1, -1)) -> np.ndarray:
+        '''
+        Returns a (histories x steps) array, one column per requested step (positive forwards, negative backwards).
+        Falls back to exact Python integers if the result could overflow int64.
+        '''
+        results: list[tuple[np.ndarray, np.ndarray]] = []
+        overflow = False
+        for length, matrix in self.matrices.items():
+            weights = np.array([lagrange_weights(length, step) for step in steps], dtype=object).T
+            bound = max((abs(int(weight)) for weight in weights.flat), default=0) * self.abs_sums[length]
+            if matrix.dtype != object and bound < np.iinfo(np.int64).max:
+                results.append((self.indexes[length], matrix @ weights.astype(np.int64)))
+            else:
+                overflow = True
+                results.append((self.indexes[length], matrix.astype(object) @ weights))
+
+        extrapolations = np.zeros((self.num_histories, len(steps)), dtype=object if overflow else np.int64)
+        for indexes, result in results:
+            extrapolations[indexes] = result
+        return extrapolations
+
+
+class StreamingExtrapolator:
+
+    def __init__(self, steps: Sequence[int] = (1, -1)):
+        self.steps: tuple[int, ...] = tuple(steps)
+        self.totals: list[int] = [0] * len(self.steps)
+        self.num_histories: int = 0
+
+    def add(self, history: list[int]) -> None:
+        for i, step in enumerate(self.steps):
+            self.totals[i] += extrapolate(history, step > 0, abs(step))
+        self.num_histories += 1
+
+    def consume(self, lines: Iterable[str]) -> Iterator[tuple[int, ...]]:
+        for line in lines:
+            if line.strip():
+                self.add(list(map(int, line.split())))
+                yield tuple(self.totals)
 
 
 class Day9:
@@ -20,6 +90,7 @@ class Day9:
         self.filepath = filepath
         self.histories: list[list[int]] = [
             list(map(int, x)) for x in self.parse()]
+        self.extrapolations: np.ndarray = HistoryMatrix(self.histories).extrapolate((1, -1))
 
     def parse_file(self) -> list[str]:
         with open(self.filepath, 'r', encoding="utf-8") as f:
@@ -29,18 +100,26 @@ class Day9:
         return [line.split() for line in self.parse_file()]
 
     def part_1(self) -> int:
-        return sum(extrapolate(history) for history in self.histories)
+        return int(self.extrapolations[:, 0].sum())
 
     def part_2(self) -> int:
-        return sum(extrapolate(history, forwards=False) for history in self.histories)
+        return int(self.extrapolations[:, 1].sum())
 
 
 if __name__ == "__main__":
     INPUT_FILEPATH = Path(__file__).parent / "data" / f"{Path(__file__).stem}.txt"
     parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--input', nargs='?', default=INPUT_FILEPATH, help=f"Path to data for {Path(__file__).stem}")
+    parser.add_argument('-i', '--input', nargs='?', default=INPUT_FILEPATH, help=f"Path to data for {Path(__file__).stem}, or '-' for stdin with --stream")
+    parser.add_argument('-s', '--stream', action='store_true', help="Read histories line by line and print running totals after each one")
     args = parser.parse_args()
+    if str(args.input) == '-' and not args.stream:
+        parser.error("reading from stdin ('-i -') requires --stream")
 
-    day9 = Day9(Path(args.input).absolute())
-    print(day9.part_1())
-    print(day9.part_2())
+    if args.stream:
+        with (sys.stdin if str(args.input) == '-' else open(args.input, 'r', encoding="utf-8")) as f:
+            for totals in StreamingExtrapolator().consume(f):
+                print(*totals, flush=True)
+    else:
+        day9 = Day9(Path(args.input).absolute())
+        print(day9.part_1())
+        print(day9.part_2())
@@ -1 +1,3 @@
-find ./day*.py -exec bash -c "echo {};python3 {}" \; > current_answers.txt
\ No newline at end of file
+find ./day*.py -exec bash -c "echo {};python3 {}" \; > current_answers.txt
+for f in $(ls ./data/day*_regression.txt); do d=${f##*/}; d=${d%%_*}; echo $f; timeout 60 python3 ./$d.py -i $f; done >> current_answers.txt
+(echo "./data/day16_regression.txt --parallel"; timeout 60 python3 ./day16.py --parallel -i ./data/day16_regression.txt) >> current_answers.txt